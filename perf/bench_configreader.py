@@ -0,0 +1,92 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+#
+# Micro-benchmark of the BenchsuiteConfigParser. It parses synthetic benchmark configurations with many workload
+# sections and long multiline scripts and reports the parsing time, using the standard ConfigParser as reference.
+#
+# Usage: python perf/bench_configreader.py [--sections N] [--script-lines N] [--repeat N]
+#
+
+import argparse
+import configparser
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from benchsuite.core.configreader import BenchsuiteConfigParser
+
+
+def synthetic_config(sections, script_lines):
+    lines = [
+        '[DEFAULT]',
+        '# the class that implements the benchmark',
+        'class = benchsuite.stdlib.benchmark.vm_benchmark.BashCommandBenchmark',
+        'tool_name = synthetic',
+        'install =',
+    ]
+    lines.extend('    apt-get install -y package-{0}'.format(i) for i in range(script_lines))
+    lines.append('')
+
+    for s in range(sections):
+        lines.extend([
+            '[workload_{0}]'.format(s),
+            '; a workload',
+            'workload_name = Workload {0}'.format(s),
+            'workload_description = synthetic workload number {0}'.format(s),
+            'execute =',
+        ])
+        for i in range(script_lines):
+            # alternate indentation levels, as in the real scripts
+            lines.append('    ' + '  ' * (i % 3) + 'run --step {0} --workload {1}'.format(i, s))
+        lines.extend(['', 'cleanup = rm -rf /tmp/workload_{0}'.format(s), ''])
+
+    return '\n'.join(lines)
+
+
+def run(parser_class, text, repeat):
+
+    def parse():
+        parser_class().read_string(text)
+
+    return min(timeit.repeat(parse, number=1, repeat=repeat))
+
+
+def main(args=None):
+    argparser = argparse.ArgumentParser(description='Micro-benchmark of the BenchsuiteConfigParser')
+    argparser.add_argument('--sections', type=int, nargs='+', default=[10, 1000, 5000])
+    argparser.add_argument('--script-lines', type=int, default=50)
+    argparser.add_argument('--repeat', type=int, default=5)
+    args = argparser.parse_args(args)
+
+    print('{0:>10} {1:>12} {2:>12} {3:>22} {4:>22}'.format(
+        'sections', 'lines', 'size (KB)', 'Benchsuite parser (s)', 'ConfigParser (s)'))
+
+    for sections in args.sections:
+        text = synthetic_config(sections, args.script_lines)
+        print('{0:>10} {1:>12} {2:>12.0f} {3:>22.4f} {4:>22.4f}'.format(
+            sections, text.count('\n') + 1, len(text) / 1024,
+            run(BenchsuiteConfigParser, text, args.repeat),
+            run(configparser.ConfigParser, text, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -58,6 +58,29 @@ setup(
     namespace_packages=['benchsuite'],
     package_dir={'': 'src'},
 
-    install_requires=['appdirs']
+    install_requires=['appdirs'],
+
+    extras_require={
+        # benchsuite.core.analysis
+        'analysis': ['numpy'],
+        # benchsuite.core.hooks.ResourceSamplerHook
+        'resources': ['psutil']
+    },
+
+    # implementations that can be referenced by name in the "class" option of the configuration files (and hooks that
+    # can be enabled by name). Other packages register their providers, benchmarks, storage connectors and hooks in
+    # the same groups
+    entry_points={
+        'benchsuite.providers': [],
+        'benchsuite.benchmarks': [],
+        'benchsuite.storage': [
+            'file = benchsuite.core.model.storage:SimpleFileBackend'
+        ],
+        'benchsuite.hooks': [
+            'cprofile = benchsuite.core.hooks:CProfileHook',
+            'tracemalloc = benchsuite.core.hooks:TracemallocHook',
+            'resources = benchsuite.core.hooks:ResourceSamplerHook'
+        ]
+    }
 
 )
@@ -0,0 +1,254 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import logging
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from benchsuite.core.columnar import ColumnarFile, ColumnarWriter, FLOAT_COLUMN
+
+logger = logging.getLogger(__name__)
+
+#
+# Statistics over the execution results. numpy is an optional dependency of the benchsuite.core package: install it
+# with the "analysis" extra (pip install benchsuite.core[analysis])
+#
+
+PROVIDER_COLUMN = 'provider.name'
+
+DEFAULT_PERCENTILES = (50, 95)
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError('numpy is required for the analysis of the results. Install benchsuite.core[analysis]')
+
+
+def _execution_results(executions):
+    # the results recorded by the executions: fetching the logs again from the execution environments would be slow
+    # (and not possible anymore once the environments are destroyed)
+    missing = 0
+    for e in executions:
+        if e.last_result is not None:
+            yield e.last_result
+        elif e.last_run_info:
+            missing += 1
+    if missing:
+        logger.warning('Ignoring %d executions whose result has not been collected', missing)
+
+
+class ResultsTable:
+    """
+    The execution results in numpy arrays, in the same long format of the columnar export (one row for each metric,
+    see benchsuite.core.columnar). String columns are dictionary encoded: an array of codes and an array with the
+    distinct values.
+
+    The statistics are returned as dictionaries column -> numpy array, with one element for each group
+    """
+
+    def __init__(self, floats, codes, dictionaries):
+        _require_numpy()
+        self.floats = floats
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.rows = len(floats['value'])
+
+    @staticmethod
+    def from_columns(columns):
+        """
+        :param columns: a ColumnarFile (the arrays are views on its memory map) or a ColumnarWriter
+        """
+        _require_numpy()
+        floats, codes, dictionaries = {}, {}, {}
+        for name in columns.column_names:
+            if columns.column_type(name) == FLOAT_COLUMN:
+                floats[name] = numpy.frombuffer(columns.column(name), dtype=numpy.float64)
+            else:
+                codes[name] = numpy.frombuffer(columns.column(name), dtype=numpy.uint32)
+                dictionaries[name] = numpy.array(columns.dictionary(name), dtype=object)
+        return ResultsTable(floats, codes, dictionaries)
+
+    @staticmethod
+    def from_results(results):
+        """
+        :param results: an iterable of ExecutionResult objects or of dictionaries with the same fields
+        """
+        return ResultsTable.from_columns(ColumnarWriter().add_all(results))
+
+    @staticmethod
+    def load(source):
+        """
+        Loads the results from a columnar file, a storage connector that supports query() (e.g. SimpleFileBackend),
+        a SessionStorageManager (the last results collected by its executions, see BenchmarkExecution.last_result) or
+        an iterable of results
+        """
+        if isinstance(source, str):
+            return ResultsTable.from_columns(ColumnarFile(source))
+        if isinstance(source, (ColumnarFile, ColumnarWriter)):
+            return ResultsTable.from_columns(source)
+        if hasattr(source, 'query'):
+            return ResultsTable.from_results(source.query())
+        if hasattr(source, 'list_executions'):
+            return ResultsTable.from_results(_execution_results(source.list_executions()))
+        return ResultsTable.from_results(source)
+
+    @property
+    def column_names(self):
+        return list(self.floats) + list(self.codes)
+
+    def values(self, name):
+        """
+        :return: the values of the column (decoded, for string columns)
+        """
+        if name in self.floats:
+            return self.floats[name]
+        return self.dictionaries[self.__codes(name)][self.codes[name]]
+
+    def select(self, mask):
+        """
+        :return: a new table with the rows selected by the mask (a boolean array)
+        """
+        return ResultsTable({k: v[mask] for k, v in self.floats.items()},
+                            {k: v[mask] for k, v in self.codes.items()},
+                            self.dictionaries)
+
+    def filter(self, metric=None, conditions=None):
+        """
+        :param conditions: a dictionary column -> value (or list of values)
+        :return: a new table with the rows of the metric that match all the conditions
+        """
+        conditions = dict(conditions or {})
+        if metric is not None:
+            conditions['metric'] = metric
+
+        mask = numpy.ones(self.rows, dtype=bool)
+        for name, accepted in conditions.items():
+            if isinstance(accepted, str) or not hasattr(accepted, '__iter__'):
+                accepted = [accepted]
+            if name in self.floats:
+                mask &= numpy.isin(self.floats[name], [float(a) for a in accepted])
+                continue
+            dictionary, codes = self.__encoded(name)
+            accepted_codes = numpy.flatnonzero(numpy.isin(dictionary, list(accepted)))
+            mask &= numpy.isin(codes, accepted_codes)
+        return self.select(mask)
+
+    def group_stats(self, metric, by=(PROVIDER_COLUMN, 'workload'), percentiles=DEFAULT_PERCENTILES):
+        """
+        Computes count, mean, stddev (sample), min, max and the percentiles (with linear interpolation, as
+        numpy.percentile()) of the values of the metric, for each group of rows with the same values in the "by"
+        columns. The rows without a numeric value are ignored.
+        :return: a dictionary with the "by" columns and the statistics (count, mean, stddev, min, max, p50, p95, ...)
+        """
+        by = list(by)
+        t = self.filter(metric)
+        valid = ~numpy.isnan(t.floats['value'])
+        values = t.floats['value'][valid]
+
+        encoded = [t.__encoded(c) for c in by]
+        keys = numpy.stack([codes[valid] for _, codes in encoded], axis=1) if by else \
+            numpy.zeros((len(values), 0), dtype=numpy.uint32)
+        groups, group_ids = numpy.unique(keys, axis=0, return_inverse=True)
+        group_ids = group_ids.reshape(-1)
+
+        stats = {c: encoded[i][0][groups[:, i]] for i, c in enumerate(by)}
+        if not len(values):
+            for name in ['count', 'mean', 'stddev', 'min', 'max'] + ['p{0:g}'.format(p) for p in percentiles]:
+                stats[name] = numpy.array([], dtype=numpy.float64)
+            return stats
+
+        count = numpy.bincount(group_ids, minlength=len(groups))
+        mean = numpy.bincount(group_ids, weights=values, minlength=len(groups)) / count
+        squares = numpy.bincount(group_ids, weights=(values - mean[group_ids]) ** 2, minlength=len(groups))
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            stddev = numpy.where(count > 1, numpy.sqrt(squares / (count - 1)), numpy.nan)
+
+        # sorted by group and then by value: the values of each group are contiguous and sorted
+        sorted_values = values[numpy.lexsort((values, group_ids))]
+        first = numpy.concatenate(([0], numpy.cumsum(count)[:-1]))
+
+        stats.update(count=count, mean=mean, stddev=stddev, min=sorted_values[first],
+                     max=sorted_values[first + count - 1])
+        for p in percentiles:
+            position = first + (count - 1) * (p / 100.0)
+            lower = numpy.floor(position).astype(numpy.intp)
+            upper = numpy.ceil(position).astype(numpy.intp)
+            stats['p{0:g}'.format(p)] = sorted_values[lower] + \
+                (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+        return stats
+
+    def compare_providers(self, metric, baseline, by=('workload',), statistic='mean',
+                          provider_column=PROVIDER_COLUMN):
+        """
+        Compares the statistic of the metric of each provider with the one of the baseline provider, for each group of
+        the "by" columns.
+        :param statistic: one of the statistics computed by group_stats() (e.g. 'mean', 'p95')
+        :return: a dictionary with the "by" columns, the provider, the value of the statistic, the value for the
+        baseline provider and the ratio value/baseline, for each group where both are available
+        """
+        by = list(by)
+        percentiles = set(DEFAULT_PERCENTILES)
+        if statistic.startswith('p'):
+            percentiles.add(float(statistic[1:]))
+        stats = self.group_stats(metric, by=[provider_column] + by, percentiles=sorted(percentiles))
+        if statistic not in stats:
+            raise ValueError('Unknown statistic "{0}"'.format(statistic))
+
+        # a key that identifies each group, without the provider
+        if by:
+            _, group_keys = numpy.unique(numpy.stack([stats[c].astype(str) for c in by], axis=1), axis=0,
+                                         return_inverse=True)
+            group_keys = group_keys.reshape(-1)
+        else:
+            group_keys = numpy.zeros(len(stats[provider_column]), dtype=numpy.intp)
+
+        is_baseline = stats[provider_column] == baseline
+        baseline_values = numpy.full(group_keys.max() + 1 if len(group_keys) else 0, numpy.nan)
+        baseline_values[group_keys[is_baseline]] = stats[statistic][is_baseline]
+
+        reference = baseline_values[group_keys]
+        selected = ~is_baseline & ~numpy.isnan(reference)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            ratio = stats[statistic] / reference
+
+        comparison = {c: stats[c][selected] for c in by}
+        comparison.update({
+            'provider': stats[provider_column][selected],
+            statistic: stats[statistic][selected],
+            'baseline': reference[selected],
+            'ratio': ratio[selected]
+        })
+        return comparison
+
+    def __codes(self, name):
+        if name not in self.codes:
+            raise ValueError('Unknown column "{0}". Available: {1}'.format(name, ', '.join(self.column_names)))
+        return name
+
+    def __encoded(self, name):
+        """
+        :return: the distinct values of the column and the index of the value of each row in them (numeric columns
+        are dictionary encoded here, to group the rows by them)
+        """
+        if name in self.floats:
+            return numpy.unique(self.floats[name], return_inverse=True)
+        return self.dictionaries[self.__codes(name)], self.codes[name]
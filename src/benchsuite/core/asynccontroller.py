@@ -0,0 +1,188 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from benchsuite.core import tracing
+from benchsuite.core.controller import BenchmarkingController
+from benchsuite.core.model.exception import BashCommandExecutionFailedException, dump_BashCommandExecution_exception
+from benchsuite.core.model.execution import BenchmarkExecution
+from benchsuite.core.model.session import BenchmarkingSession
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBenchmarkingController:
+    """
+    asyncio facade to the BenchmarkingController.
+
+    The phases of the executions use the async hooks of Benchmark, ServiceProvider and StorageConnector when the
+    implementations provide them. Otherwise the blocking methods are executed in a pool of max_workers threads, so
+    that the event loop is never blocked.
+
+    The phases are traced with the tracer of the controller (see tracing.Tracer) and its hooks are called before and
+    after them (in the event loop thread)
+    """
+
+    def __init__(self, config_folder=None, storage_config_file=None, max_workers=None, controller=None):
+        self.controller = controller or BenchmarkingController(config_folder, storage_config_file)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='benchsuite-async')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        try:
+            return await self.run_sync(self.controller.__exit__, exc_type, exc_value, traceback)
+        finally:
+            self.executor.shutdown()
+
+    async def run_sync(self, func, *args, **kwargs):
+        """Executes the blocking callable in the thread pool"""
+        loop = asyncio.get_running_loop()
+        # run_in_executor() does not copy the context: propagate the current span to the thread
+        return await loop.run_in_executor(self.executor, functools.partial(tracing.propagate(func), *args, **kwargs))
+
+    #
+    # SESSIONS
+    #
+
+    async def new_session(self, cloud_provider_name: str, cloud_service_name: str,
+                          properties={}) -> BenchmarkingSession:
+        return await self.run_sync(self.controller.new_session, cloud_provider_name, cloud_service_name,
+                                   properties=properties)
+
+    async def destroy_session(self, session_id: str) -> None:
+        return await self.run_sync(self.controller.destroy_session, session_id)
+
+    #
+    # EXECUTIONS
+    #
+
+    async def new_execution(self, session_id: str, tool: str, workload: str) -> BenchmarkExecution:
+        return await self.run_sync(self.controller.new_execution, session_id, tool, workload)
+
+    async def prepare_execution(self, exec_id, session_id=None, force=None):
+        e = await self.run_sync(self.controller.get_execution, exec_id, session_id)
+        logger.debug("Execution loaded: {0}".format(e))
+
+        try:
+            with self.controller._phase('prepare_execution', **tracing.execution_attributes(e)):
+                return await e.prepare_async(self.run_sync,
+                                             force=self.controller.force_prepare if force is None else force)
+
+        except BashCommandExecutionFailedException as ex:
+            self.__dump_command_error(exec_id, ex)
+            await self.__store_execution_error(e, ex, 'prepare')
+            logger.info('Continuing with the next test')
+            raise ex
+
+    async def run_execution(self, exec_id, _async=False, session_id=None):
+        e = await self.run_sync(self.controller.get_execution, exec_id, session_id)
+
+        try:
+            with self.controller._phase('run_execution', **tracing.execution_attributes(e)):
+                r = await e.execute_async(self.run_sync, _async=_async)
+
+        except BashCommandExecutionFailedException as ex:
+            self.__dump_command_error(exec_id, ex)
+            await self.__store_execution_error(e, ex, 'run')
+            raise ex
+
+        except Exception as ex:
+            await self.__store_execution_error(e, ex, 'run')
+            raise ex
+
+        if not _async:
+            try:
+                await self.store_execution_result(exec_id, session_id=session_id)
+            except Exception as ex:
+                await self.__store_execution_error(e, ex, 'parsing')
+                raise ex
+
+        return r
+
+    async def cleanup_execution(self, exec_id, session_id=None):
+        e = await self.run_sync(self.controller.get_execution, exec_id, session_id)
+
+        try:
+            with self.controller._phase('cleanup_execution', **tracing.execution_attributes(e)):
+                return await e.cleanup_async(self.run_sync)
+
+        except BashCommandExecutionFailedException as ex:
+            self.__dump_command_error(exec_id, ex)
+            await self.__store_execution_error(e, ex, 'prepare')
+            logger.info('Continuing with the next test')
+            raise ex
+
+    async def store_execution_result(self, exec_id, session_id=None):
+        e = await self.run_sync(self.controller.get_execution, exec_id, session_id)
+        configured, save_async = await self.run_sync(self.__saving, 'save_execution_result_async')
+
+        if not configured:
+            logger.warning('Result Storage not configured. Storage of results is disabled.')
+            return
+
+        with self.controller._phase('store_execution_result', **tracing.execution_attributes(e)):
+            r = await self.run_sync(self.controller._new_execution_result, e)
+            if save_async:
+                await save_async(r)
+            else:
+                await self.run_sync(self.controller._save_record, 'result', r)
+
+    async def __store_execution_error(self, execution, exception, phase):
+        # the error is created here, while the exception is being handled, to get the traceback
+        exec_err_obj = self.controller._new_execution_error(execution, exception, phase)
+        configured, save_async = await self.run_sync(self.__saving, 'save_execution_error_async')
+
+        if not configured:
+            logger.warning('Results storage not configured. The logging of the exception is disabled')
+            return
+
+        if save_async:
+            await save_async(exec_err_obj)
+        else:
+            await self.run_sync(self.controller._save_record, 'error', exec_err_obj)
+
+    def __saving(self, async_method):
+        """
+        Executed in the thread pool: the storage, the spool, the buffer and the writer of the controller are loaded
+        lazily (e.g. reading the configuration or connecting to the storage)
+        :return: whether the results can be saved (or spooled) and the async method of the storage to save them, or
+        None if they must be saved with the controller
+        """
+        storage = self.controller.results_storage
+        spool = self.controller.results_spool
+        if not storage:
+            return spool is not None, None
+
+        # the async hooks of the storage are used only if the results are not spooled, buffered or written in
+        # background
+        saves_directly = spool is None and self.controller.results_buffer is None and \
+            self.controller.results_writer is None
+        return True, getattr(storage, async_method, None) if saves_directly else None
+
+    @staticmethod
+    def __dump_command_error(exec_id, ex):
+        error_file = 'last_cmd_error_{0}.dump'.format(exec_id)
+        logger.error('Exception executing commands, dumping to {0}'.format(error_file))
+        dump_BashCommandExecution_exception(ex, error_file)
@@ -0,0 +1,338 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import json
+import logging
+import math
+import mmap
+import struct
+import sys
+from array import array
+
+logger = logging.getLogger(__name__)
+
+#
+# Columnar export of the execution results.
+#
+# The results are flattened in "long" format: one row for each metric of each result, with the fields of the result,
+# the provider properties (provider.<key>) and the execution environment specs (exec_env.<key>) repeated on each row.
+# Numeric columns are arrays of doubles, string columns are dictionary encoded (an array of unsigned int codes and
+# the list of the distinct values, where the code 0 is always the empty string). The type of the columns not in
+# FIXED_COLUMNS is inferred from their first value: numeric if it is a number, string otherwise (a numeric column is
+# converted to string if a later value is not a number).
+#
+# File format (little endian):
+#   - magic (8 bytes)
+#   - length of the header (4 bytes)
+#   - header: json with the number of rows and, for each column, its name, type, offset and length in bytes and the
+#     dictionary (for string columns)
+#   - the data of the columns, each one aligned to 8 bytes, so that the file can be memory mapped and the columns
+#     used directly (e.g. with numpy.frombuffer())
+#
+
+MAGIC = b'BSCOL\x00\x00\x01'
+
+FLOAT_COLUMN = 'float64'
+STRING_COLUMN = 'dict'
+
+_TYPECODES = {FLOAT_COLUMN: 'd', STRING_COLUMN: 'I'}
+_HEADER_LENGTH = struct.Struct('<I')
+_ALIGNMENT = 8
+
+# the columns always present, in this order. The others are added when found in the results
+FIXED_COLUMNS = [
+    ('exec_id', STRING_COLUMN),
+    ('start', FLOAT_COLUMN),
+    ('duration', FLOAT_COLUMN),
+    ('tool', STRING_COLUMN),
+    ('workload', STRING_COLUMN),
+    ('service_type', STRING_COLUMN),
+    ('metric', STRING_COLUMN),
+    ('value', FLOAT_COLUMN),
+    ('unit', STRING_COLUMN),
+]
+
+
+def _get(result, field, default=None):
+    # results can be ExecutionResult objects or dictionaries (e.g. from SimpleFileBackend.query())
+    if isinstance(result, dict):
+        return result.get(field, default)
+    return getattr(result, field, default)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _format_number(value):
+    if math.isnan(value):
+        return None
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class _FloatColumn:
+
+    type = FLOAT_COLUMN
+
+    def __init__(self, rows=0):
+        self.data = array('d', [math.nan]) * rows
+
+    def append(self, value):
+        self.data.append(_to_float(value))
+
+    def to_string_column(self):
+        column = _StringColumn()
+        for value in self.data:
+            column.append(_format_number(value))
+        return column
+
+    def header(self):
+        return {}
+
+
+class _StringColumn:
+
+    type = STRING_COLUMN
+
+    def __init__(self, rows=0):
+        self.codes = {'': 0}
+        self.dictionary = ['']
+        self.data = array('I', [0]) * rows
+
+    def append(self, value):
+        value = '' if value is None else str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        self.data.append(code)
+
+    def header(self):
+        return {'dictionary': self.dictionary}
+
+
+class ColumnarWriter:
+    """
+    Flattens the execution results in columns and writes them in the columnar file format
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.__columns = {name: self.__new_column(t) for name, t in FIXED_COLUMNS}
+        # the columns whose type is inferred from the values
+        self.__inferred = set()
+
+    def add(self, result):
+        """
+        Adds a row for each metric of the result (or one row without metric, if it has no metrics)
+        """
+        extra = {}
+        for prefix in ('provider', 'exec_env', 'properties'):
+            values = _get(result, prefix)
+            if isinstance(values, dict):
+                for k, v in values.items():
+                    extra['{0}.{1}'.format(prefix, k)] = v
+
+        metrics = _get(result, 'metrics') or {'': {}}
+        for metric, m in metrics.items():
+            if not isinstance(m, dict):
+                m = {'value': m}
+            row = {
+                'exec_id': _get(result, 'exec_id'),
+                'start': _get(result, 'start'),
+                'duration': _get(result, 'duration'),
+                'tool': _get(result, 'tool'),
+                'workload': _get(result, 'workload'),
+                'service_type': _get(result, 'service_type'),
+                'metric': metric,
+                'value': m.get('value'),
+                'unit': m.get('unit'),
+            }
+            row.update(extra)
+            self.__add_row(row)
+
+    def add_all(self, results):
+        for r in results:
+            self.add(r)
+        return self
+
+    def write(self, file):
+        columns = list(self.__columns.items())
+        header = {'rows': self.rows, 'byteorder': 'little', 'columns': []}
+
+        # the offsets depend on the length of the header, that depends on the offsets: the header is padded to a
+        # fixed length, computed with large enough offsets
+        def build_header(base):
+            header['columns'] = []
+            offset = base
+            for name, c in columns:
+                length = len(c.data) * c.data.itemsize
+                h = {'name': name, 'type': c.type, 'offset': offset, 'length': length}
+                h.update(c.header())
+                header['columns'].append(h)
+                offset += length + (-length % _ALIGNMENT)
+            return json.dumps(header).encode('utf-8')
+
+        size = len(build_header(sys.maxsize))
+        base = len(MAGIC) + _HEADER_LENGTH.size + size
+        base += -base % _ALIGNMENT
+        encoded = build_header(base)
+        encoded += b' ' * (base - len(MAGIC) - _HEADER_LENGTH.size - len(encoded))
+
+        with open(file, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LENGTH.pack(len(encoded)))
+            f.write(encoded)
+            for _, c in columns:
+                data = c.data
+                if sys.byteorder != 'little':
+                    data = array(data.typecode, data)
+                    data.byteswap()
+                data.tofile(f)
+                f.write(b'\0' * (-len(data) * data.itemsize % _ALIGNMENT))
+
+        logger.debug('%d rows and %d columns written to %s', self.rows, len(columns), file)
+
+    #
+    # the same methods of ColumnarFile, to use the columns without writing them
+    #
+
+    @property
+    def column_names(self):
+        return list(self.__columns)
+
+    def column_type(self, name):
+        return self.__columns[name].type
+
+    def column(self, name) -> memoryview:
+        return memoryview(self.__columns[name].data)
+
+    def dictionary(self, name):
+        return self.__columns[name].dictionary
+
+    def __add_row(self, row):
+        for name, value in row.items():
+            if value is None:
+                continue
+            c = self.__columns.get(name)
+            if c is None:
+                # filled with empty values for the previous rows
+                self.__columns[name] = self.__new_column(FLOAT_COLUMN if _is_number(value) else STRING_COLUMN,
+                                                         self.rows)
+                self.__inferred.add(name)
+            elif c.type == FLOAT_COLUMN and name in self.__inferred and not _is_number(value):
+                self.__columns[name] = c.to_string_column()
+        for name, c in self.__columns.items():
+            c.append(row.get(name))
+        self.rows += 1
+
+    @staticmethod
+    def __new_column(column_type, rows=0):
+        return _FloatColumn(rows) if column_type == FLOAT_COLUMN else _StringColumn(rows)
+
+
+def export_results(results, file):
+    """
+    Writes the execution results in a columnar file.
+    :param results: an iterable of ExecutionResult objects or of dictionaries with the same fields
+    :return: the number of rows written
+    """
+    writer = ColumnarWriter().add_all(results)
+    writer.write(file)
+    return writer.rows
+
+
+class ColumnarFile:
+    """
+    Reads a columnar file through a memory map: the columns are returned as memoryviews on the file content, without
+    copying them
+    """
+
+    def __init__(self, file):
+        self.file = file
+        with open(file, 'rb') as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.__mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError('{0} is not a columnar results file'.format(file))
+
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        length, = _HEADER_LENGTH.unpack_from(self.__mmap, len(MAGIC))
+        header = json.loads(self.__mmap[start:start + length].decode('utf-8'))
+        self.rows = header['rows']
+        self.__columns = {c['name']: c for c in header['columns']}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def column_names(self):
+        return list(self.__columns)
+
+    def column_type(self, name):
+        return self.__columns[name]['type']
+
+    def column(self, name) -> memoryview:
+        """
+        :return: the values (for float64 columns) or the dictionary codes (for string columns) of the column
+        """
+        c = self.__columns[name]
+        view = memoryview(self.__mmap)[c['offset']:c['offset'] + c['length']]
+        if sys.byteorder != 'little':
+            data = array(_TYPECODES[c['type']])
+            data.frombytes(view)
+            data.byteswap()
+            return memoryview(data)
+        return view.cast(_TYPECODES[c['type']])
+
+    def dictionary(self, name):
+        """
+        :return: the distinct values of a string column. The codes returned by column() are indexes in this list
+        """
+        return self.__columns[name]['dictionary']
+
+    def values(self, name):
+        """
+        :return: the values of the column as a list (decoded, for string columns)
+        """
+        data = self.column(name)
+        if self.column_type(name) == STRING_COLUMN:
+            dictionary = self.dictionary(name)
+            return [dictionary[c] for c in data]
+        return data.tolist()
+
+    def close(self):
+        if self.__mmap is not None:
+            try:
+                self.__mmap.close()
+            except BufferError:
+                # there are still views on the content: it is closed when they are released
+                pass
+            self.__mmap = None
@@ -17,20 +17,35 @@
 # Developed in the ARTIST EU project (www.artist-project.eu) and in the
 # CloudPerfect EU project (https://cloudperfect.eu/)
 
-import configparser
-import glob
-import json
+import fnmatch
 import os
 import re
 
 import logging
 from appdirs import user_data_dir, user_config_dir
 
+from benchsuite.core.configcache import read_config_file
+from benchsuite.core.model.benchmark import BenchmarkTemplate
 from benchsuite.core.model.exception import ControllerConfigurationException
 
 logger = logging.getLogger(__name__)
 
 
+DATA_FOLDER_ENV_VAR_NAME = 'BENCHSUITE_DATA_FOLDER'
+
+
+def get_data_folder():
+    """
+    :return: the folder of the data of the Benchmarking Suite (sessions, caches, local results, ...): the one in the
+    BENCHSUITE_DATA_FOLDER environment variable, if set, or the user data folder (created if it does not exist)
+    """
+    if DATA_FOLDER_ENV_VAR_NAME in os.environ:
+        return os.environ[DATA_FOLDER_ENV_VAR_NAME]
+    d = user_data_dir('benchmarking-suite', None)
+    os.makedirs(d, exist_ok=True)
+    return d
+
+
 class ServiceProviderConfiguration():
     """
     Represents the configuration file of a cloud provider
@@ -41,16 +56,9 @@ class ServiceProviderConfiguration():
 
         # TODO: use here the functions in provider.py to load the providers from the configuration
         try:
-            with open(config_file) as f:
-                config = configparser.ConfigParser()
-                config.read_dict(json.load(f))
-        except ValueError as ex:
-            logger.warning('Got an exception trying to decode configuration file as json: ' + str(ex))
-            try:
-                config = configparser.ConfigParser()
-                config.read(config_file)
-            except Exception as ex:
-                raise ControllerConfigurationException('Invalid configuration provided: {0}'.format(str(ex)))
+            config = read_config_file(config_file)
+        except Exception as ex:
+            raise ControllerConfigurationException('Invalid configuration provided: {0}'.format(str(ex)))
 
         # TODO: libcloud_extra_params should not go here because it is something dependant from the implemetnation of
         sections = [s for s in list(config.keys()) if s != 'DEFAULT' and s != 'provider' and s != 'libcloud_extra_params']
@@ -69,8 +77,7 @@ class BenchmarkToolConfiguration():
     def __init__(self, config_file):
         self.id = os.path.basename(config_file)[:-5]
 
-        config = configparser.ConfigParser()
-        config.read(config_file)
+        config = read_config_file(config_file, try_json=False)
 
         self.tool_name = config['DEFAULT']['tool_name']
 
@@ -95,6 +102,9 @@ class BenchmarkToolConfiguration():
 class ControllerConfiguration():
     '''
     Model the Benchmarking Suite configuration.
+
+    The configuration objects and the content of the configuration folders are cached and reloaded only when the
+    modification time (or the size) of the file or folder changes
     '''
 
     CLOUD_PROVIDERS_DIR = 'providers'
@@ -108,6 +118,8 @@ class ControllerConfiguration():
 
         self.alternative_config_dir = alternative_config_dir
 
+        self.__cache = {}
+
         logger.debug('Using default configuration directory: %s', self.default_config_dir)
         logger.debug('Using alternative configuration directory: %s', self.alternative_config_dir)
 
@@ -117,6 +129,37 @@ class ControllerConfiguration():
             os.makedirs(d)
         return d
 
+    def __cached(self, key, path, loader):
+        """
+        Returns loader(path), cached until the mtime or the size of path change
+        """
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self.__cache.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        value = loader(path)
+        self.__cache[key] = (stamp, value)
+        return value
+
+    def __load(self, clazz, config_file):
+        return self.__cached((clazz, config_file), config_file, clazz)
+
+    def __list_dir(self, folder):
+        return self.__cached(('listdir', folder), folder, os.listdir)
+
+    def __glob(self, folder, pattern):
+        """
+        Same as glob.glob(os.path.join(folder, pattern)), but using the cached content of the folder
+        """
+        try:
+            files = self.__list_dir(folder)
+        except FileNotFoundError:
+            return []
+
+        return [os.path.join(folder, f) for f in fnmatch.filter(files, pattern) if not f.startswith('.')]
+
     def list_available_providers(self):
         """
         Lists all the ServiceProvider configuration files found in the configuration folders
@@ -125,21 +168,21 @@ class ControllerConfiguration():
         providers = []
 
         if self.alternative_config_dir:
-            for f in os.listdir(os.path.join(self.alternative_config_dir, self.CLOUD_PROVIDERS_DIR)):
+            for f in self.__list_dir(os.path.join(self.alternative_config_dir, self.CLOUD_PROVIDERS_DIR)):
                 if os.path.splitext(f)[1] in ['.conf', '.json']:
                     try:
                         n = os.path.join(self.alternative_config_dir, self.CLOUD_PROVIDERS_DIR, f)
-                        providers.append(ServiceProviderConfiguration(n))
+                        providers.append(self.__load(ServiceProviderConfiguration, n))
                     except ControllerConfigurationException:
                         pass
 
         default_dir = os.path.join(self.default_config_dir, self.CLOUD_PROVIDERS_DIR)
         if os.path.exists(default_dir):
-            for f in os.listdir(os.path.join(self.default_config_dir, self.CLOUD_PROVIDERS_DIR)):
+            for f in self.__list_dir(os.path.join(self.default_config_dir, self.CLOUD_PROVIDERS_DIR)):
                 if os.path.splitext(f)[1] in ['.conf', '.json']:
                     try:
                         n = os.path.join(self.default_config_dir, self.CLOUD_PROVIDERS_DIR, f)
-                        providers.append(ServiceProviderConfiguration(n))
+                        providers.append(self.__load(ServiceProviderConfiguration, n))
                     except ControllerConfigurationException:
                         pass
 
@@ -153,28 +196,31 @@ class ControllerConfiguration():
         benchmarks = []
 
         if self.alternative_config_dir:
-            for n in glob.glob(os.path.join(self.alternative_config_dir, self.BENCHMARKS_DIR, '*.conf')):
-                benchmarks.append(BenchmarkToolConfiguration(n))
+            for n in self.__glob(os.path.join(self.alternative_config_dir, self.BENCHMARKS_DIR), '*.conf'):
+                benchmarks.append(self.__load(BenchmarkToolConfiguration, n))
 
-        for n in glob.glob(os.path.join(self.default_config_dir, self.BENCHMARKS_DIR, '*.conf')):
-            benchmarks.append(BenchmarkToolConfiguration(n))
+        for n in self.__glob(os.path.join(self.default_config_dir, self.BENCHMARKS_DIR), '*.conf'):
+            benchmarks.append(self.__load(BenchmarkToolConfiguration, n))
 
         return benchmarks
 
     def get_provider_by_name(self, name: str) -> ServiceProviderConfiguration:
-        return ServiceProviderConfiguration(self.get_provider_config_file(name))
+        return self.__load(ServiceProviderConfiguration, self.get_provider_config_file(name))
 
     def get_benchmark_by_name(self, name):
 
         if self.alternative_config_dir:
-            for n in glob.glob(os.path.join(self.alternative_config_dir, self.BENCHMARKS_DIR, name + '.conf')):
-                return BenchmarkToolConfiguration(n)
+            for n in self.__glob(os.path.join(self.alternative_config_dir, self.BENCHMARKS_DIR), name + '.conf'):
+                return self.__load(BenchmarkToolConfiguration, n)
 
-        for n in glob.glob(os.path.join(self.default_config_dir, self.BENCHMARKS_DIR, name + '.conf')):
-            return BenchmarkToolConfiguration(n)
+        for n in self.__glob(os.path.join(self.default_config_dir, self.BENCHMARKS_DIR), name + '.conf'):
+            return self.__load(BenchmarkToolConfiguration, n)
 
         raise ControllerConfigurationException('Benchmark with name {0} does not exist'.format(name))
 
+    def get_benchmark_template(self, name) -> BenchmarkTemplate:
+        return self.__load(BenchmarkTemplate, self.get_benchmark_config_file(name))
+
 
     # TODO: add an alternative location (based on environment variable)
     def get_storage_config_file(self):
@@ -207,12 +253,12 @@ class ControllerConfiguration():
             return name
 
         if self.alternative_config_dir:
-            for f in os.listdir(os.path.join(self.alternative_config_dir, self.CLOUD_PROVIDERS_DIR)):
+            for f in self.__list_dir(os.path.join(self.alternative_config_dir, self.CLOUD_PROVIDERS_DIR)):
                 if os.path.splitext(f)[0] == name:
                     return os.path.join(self.alternative_config_dir, self.CLOUD_PROVIDERS_DIR, f)
 
 
-        for f in os.listdir(os.path.join(self.default_config_dir, self.CLOUD_PROVIDERS_DIR)):
+        for f in self.__list_dir(os.path.join(self.default_config_dir, self.CLOUD_PROVIDERS_DIR)):
             if os.path.splitext(f)[0] == name:
                 return os.path.join(self.default_config_dir, self.CLOUD_PROVIDERS_DIR, f)
 
@@ -0,0 +1,121 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import configparser
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+#
+# Reads the configuration files (json or ini format) and keeps a compiled copy of the parsed files in a cache folder
+# (usually in the data folder), so that the same configuration is parsed only once, even across processes. The
+# compiled files are keyed by the hash of the file content and of the parser used, so they never need to be
+# invalidated
+#
+
+COMPILED_CONFIG_CACHE_DIR = 'config-cache'
+
+# change it when the format of the compiled files changes
+FORMAT_VERSION = 1
+
+_cache_dir = None
+
+
+def enable_compiled_cache(folder):
+    global _cache_dir
+    os.makedirs(folder, exist_ok=True)
+    _cache_dir = folder
+    logger.debug('Using compiled configuration cache in %s', folder)
+
+
+def disable_compiled_cache():
+    global _cache_dir
+    _cache_dir = None
+
+
+def read_config_file(config_file, parser_class=configparser.ConfigParser, try_json=True):
+    """
+    Reads the configuration file trying first to decode it as json (if try_json is True) and then as ini file.
+    :return: a new parser_class object with the content of the file
+    """
+    with open(config_file) as f:
+        content = f.read()
+
+    if not _cache_dir:
+        return _parse(content, config_file, parser_class, try_json)
+
+    key = hashlib.sha256('{0}.{1}:{2}:{3}\n'.format(parser_class.__module__, parser_class.__qualname__,
+                                                    try_json, FORMAT_VERSION).encode('utf-8'))
+    key.update(content.encode('utf-8', 'surrogateescape'))
+    compiled_file = os.path.join(_cache_dir, key.hexdigest() + '.pickle')
+
+    try:
+        with open(compiled_file, 'rb') as f:
+            return _restore(parser_class(), pickle.load(f))
+    except FileNotFoundError:
+        pass
+    except Exception as ex:
+        logger.warning('Ignoring invalid compiled configuration %s: %s', compiled_file, str(ex))
+
+    config = _parse(content, config_file, parser_class, try_json)
+    _store(compiled_file, config)
+    return config
+
+
+def _parse(content, config_file, parser_class, try_json):
+    if try_json:
+        try:
+            config = parser_class()
+            config.read_dict(json.loads(content))
+            return config
+        except ValueError as ex:
+            logger.debug('Configuration file %s is not json (%s). Reading it as ini file', config_file, str(ex))
+
+    config = parser_class()
+    config.read_string(content, source=config_file)
+    return config
+
+
+def _store(compiled_file, config):
+    # the raw values are stored (and restored) directly, because read_dict() would validate the interpolation syntax
+    # and reject values that the parser accepted when reading the file
+    data = {
+        'defaults': dict(config._defaults),
+        'sections': [(name, dict(options)) for name, options in config._sections.items()]
+    }
+    try:
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(compiled_file), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, compiled_file)
+    except OSError as ex:
+        logger.warning('Impossible to write the compiled configuration %s: %s', compiled_file, str(ex))
+
+
+def _restore(config, data):
+    config._defaults.update(data['defaults'])
+    for name, options in data['sections']:
+        config._sections[name] = config._dict(options)
+        config._proxies[name] = configparser.SectionProxy(config, name)
+    return config
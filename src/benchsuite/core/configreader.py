@@ -1,7 +1,7 @@
 import configparser
 import itertools
+import os
 import sys
-import textwrap
 
 #
 # Custom ConfigParser to correctly keep indentation in multiline string values
@@ -38,32 +38,41 @@ class BenchsuiteConfigParser(configparser.ConfigParser):
         lineno = 0
         indent_level = 0
         e = None                              # None, or an exception
+        # --- MODIFIED ---
+        # the loop below is the one of ConfigParser with the invariant lookups moved out of the loop, the comment
+        # prefixes checked with a single startswith() and the inline comment prefixes searched only in the lines
+        # that contain one of them. The result is the same of the original code
+        comment_prefixes = tuple(self._comment_prefixes)
+        inline_comment_prefixes = tuple(self._inline_comment_prefixes)
+        empty_lines_in_values = self._empty_lines_in_values
+        sections = self._sections
+        sectcre_match = self.SECTCRE.match
+        optcre_match = self._optcre.match
         for lineno, line in enumerate(fp, start=1):
             comment_start = sys.maxsize
             # strip inline comments
-            inline_prefixes = {p: -1 for p in self._inline_comment_prefixes}
-            while comment_start == sys.maxsize and inline_prefixes:
-                next_prefixes = {}
-                for prefix, index in inline_prefixes.items():
-                    index = line.find(prefix, index+1)
-                    if index == -1:
-                        continue
-                    next_prefixes[prefix] = index
-                    if index == 0 or (index > 0 and line[index-1].isspace()):
-                        comment_start = min(comment_start, index)
-                inline_prefixes = next_prefixes
+            if inline_comment_prefixes and any(p in line for p in inline_comment_prefixes):
+                inline_prefixes = {p: -1 for p in inline_comment_prefixes}
+                while comment_start == sys.maxsize and inline_prefixes:
+                    next_prefixes = {}
+                    for prefix, index in inline_prefixes.items():
+                        index = line.find(prefix, index+1)
+                        if index == -1:
+                            continue
+                        next_prefixes[prefix] = index
+                        if index == 0 or (index > 0 and line[index-1].isspace()):
+                            comment_start = min(comment_start, index)
+                    inline_prefixes = next_prefixes
             # strip full line comments
-            for prefix in self._comment_prefixes:
-                if line.strip().startswith(prefix):
-                    comment_start = 0
-                    break
+            if comment_prefixes and line.strip().startswith(comment_prefixes):
+                comment_start = 0
             if comment_start == sys.maxsize:
                 comment_start = None
             # --- MODIFIED ---
             # use rstrip() instead of strip() to keep spaces at the beginning of the lines
             value = line[:comment_start].rstrip()
             if not value:
-                if self._empty_lines_in_values:
+                if empty_lines_in_values:
                     # add empty line to the value, but only if there was no
                     # comment on the line
                     if (comment_start is None and
@@ -76,8 +85,10 @@ class BenchsuiteConfigParser(configparser.ConfigParser):
                     indent_level = sys.maxsize
                 continue
             # continuation line?
-            first_nonspace = self.NONSPACECRE.search(line)
-            cur_indent_level = first_nonspace.start() if first_nonspace else 0
+            # --- MODIFIED ---
+            # value is not empty, so the line has a non-space character and its position is the same that
+            # NONSPACECRE would find
+            cur_indent_level = len(line) - len(line.lstrip())
             if (cursect is not None and optname and
                 cur_indent_level > indent_level):
                 cursect[optname].append(value)
@@ -85,20 +96,20 @@ class BenchsuiteConfigParser(configparser.ConfigParser):
             else:
                 indent_level = cur_indent_level
                 # is it a section header?
-                mo = self.SECTCRE.match(value)
+                mo = sectcre_match(value)
                 if mo:
                     sectname = mo.group('header')
-                    if sectname in self._sections:
+                    if sectname in sections:
                         if self._strict and sectname in elements_added:
                             raise configparser.DuplicateSectionError(sectname, fpname,
                                                                      lineno)
-                        cursect = self._sections[sectname]
+                        cursect = sections[sectname]
                         elements_added.add(sectname)
                     elif sectname == self.default_section:
                         cursect = self._defaults
                     else:
                         cursect = self._dict()
-                        self._sections[sectname] = cursect
+                        sections[sectname] = cursect
                         self._proxies[sectname] = configparser.SectionProxy(self, sectname)
                         elements_added.add(sectname)
                     # So sections can't start with a continuation line
@@ -108,7 +119,7 @@ class BenchsuiteConfigParser(configparser.ConfigParser):
                     raise configparser.MissingSectionHeaderError(fpname, lineno, line)
                 # an option line?
                 else:
-                    mo = self._optcre.match(value)
+                    mo = optcre_match(value)
                     if mo:
                         optname, vi, optval = mo.group('option', 'vi', 'value')
                         if not optname:
@@ -145,10 +156,28 @@ class BenchsuiteConfigParser(configparser.ConfigParser):
         for section, options in all_sections:
             for name, val in options.items():
                 if isinstance(val, list):
-                    val = '\n'.join(val).rstrip()
                     # --- MODIFIED ---
-                    # added dedent function to remove leading spaces after the multiline string has been joined
-                    val = textwrap.dedent(val)
+                    # remove the leading spaces common to all the lines, as textwrap.dedent() would do after the
+                    # multiline string has been joined
+                    val = '\n'.join(_dedent_lines(val)).rstrip()
                 options[name] = self._interpolation.before_read(self,
                                                                 section,
-                                                                name, val)
\ No newline at end of file
+                                                                name, val)
+
+
+def _dedent_lines(lines):
+    """
+    Returns the lines without the leading spaces and tabs they have in common. The lines are the ones collected by
+    BenchsuiteConfigParser._read(): they are empty or they end with a non-space character. For these lines the result,
+    once joined, is the same of textwrap.dedent('\\n'.join(lines)), without the regular expressions it uses.
+    """
+    # the first line is stripped: if not empty, there is no common margin
+    if lines[0]:
+        return lines
+
+    margin = os.path.commonprefix([l[:len(l) - len(l.lstrip(' \t'))] for l in lines if l])
+    if not margin:
+        return lines
+
+    cut = len(margin)
+    return [l[cut:] for l in lines]
@@ -20,50 +20,322 @@
 import os
 import re
 import logging
+import threading
+import time
 import traceback
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_EXCEPTION, FIRST_COMPLETED
 from typing import Dict, Tuple, List
 
 import datetime
-
-from benchsuite.core.config import ControllerConfiguration
-from benchsuite.core.model.benchmark import load_benchmark_from_config_file
-from benchsuite.core.model.exception import ControllerConfigurationException, UndefinedExecutionException, \
-    BashCommandExecutionFailedException, dump_BashCommandExecution_exception, NoExecuteCommandsFound
-from benchsuite.core.model.execution import BenchmarkExecution, ExecutionError
+import functools
+
+from benchsuite.core import registry, tracing
+from benchsuite.core.config import ControllerConfiguration, DATA_FOLDER_ENV_VAR_NAME, get_data_folder
+from benchsuite.core.configcache import enable_compiled_cache, COMPILED_CONFIG_CACHE_DIR
+from benchsuite.core.hooks import load_hooks, run_hooks
+from benchsuite.core.model.exception import ControllerConfigurationException, BashCommandExecutionFailedException, \
+    dump_BashCommandExecution_exception, NoExecuteCommandsFound, ParsingException
+from benchsuite.core.logstore import LogStore, LogRef
+from benchsuite.core.metricscache import MetricsCache, DEFAULT_METRICS_CACHE_DB, logs_hash, parse_logs, parser_key
+from benchsuite.core.model.envpool import EnvironmentPool, DEFAULT_ENV_POOL_TTL
+from benchsuite.core.model.execution import BenchmarkExecution, ExecutionError, ExecutionResult
+from benchsuite.core.model.logs import SpilledLogs
 from benchsuite.core.model.provider import load_service_provider_from_config_file, load_provider_from_config, \
     load_provider_from_config_string
 from benchsuite.core.model.session import BenchmarkingSession
 from benchsuite.core.model.storage import load_storage_connector_from_config_file, load_storage_connector_from_config_string
+from benchsuite.core.repetition import RepetitionPolicy, aggregate_results
+from benchsuite.core.results import ResultsBuffer, ResultsWriter, ResultsSpool, DEFAULT_BATCH_MAX_BYTES, \
+    DEFAULT_BATCH_MAX_DELAY, RESULTS_SPOOL_FILE
 from benchsuite.core.sessionmanager import SessionStorageManager
 
 
 CONFIG_FOLDER_ENV_VAR_NAME = 'BENCHSUITE_CONFIG_FOLDER'
-DATA_FOLDER_ENV_VAR_NAME = 'BENCHSUITE_DATA_FOLDER'
 PROVIDER_STRING_ENV_VAR_NAME = 'BENCHSUITE_PROVIDER'
 SERVICE_TYPE_STRING_ENV_VAR_NAME = 'BENCHSUITE_SERVICE_TYPE'
 STORAGE_CONFIG_FILE_ENV_VAR = 'BENCHSUITE_STORAGE_CONFIG'
+MEASURE_STARTUP_ENV_VAR = 'BENCHSUITE_MEASURE_STARTUP'
+HOOKS_ENV_VAR_NAME = 'BENCHSUITE_HOOKS'
+
+# folder (in the data folder) of the logs streamed by the benchmarks that are too large to be kept in memory
+SPILLED_LOGS_DIR = 'logs'
+
+# folder (in the data folder) of the LogStore
+LOG_STORE_DIR = 'logstore'
+
+# folder (in the data folder) of the reports of the hooks enabled with the BENCHSUITE_HOOKS environment variable
+HOOKS_OUTPUT_DIR = 'hooks'
+
+_NOT_LOADED = object()
 
 
 logger = logging.getLogger(__name__)
 
 
 class BenchmarkingController:
-    """The facade to all Benchmarking Suite operations"""
+    """
+    The facade to all Benchmarking Suite operations.
+
+    The session storage and the results storage connector are loaded only when used the first time, so that the
+    operations that do not need them (e.g. listing the providers or the benchmarks) start quickly. If measure_startup
+    is True (or the BENCHSUITE_MEASURE_STARTUP environment variable is set), the time spent to initialize each
+    component is logged and collected in startup_timings.
 
-    def __init__(self, config_folder=None, storage_config_file=None):
+    If results_batch_size > 1, the execution results are buffered and saved in batches (see ResultsBuffer). The
+    buffer is flushed also when results_batch_bytes or results_batch_delay are exceeded and on exit. A failed batch
+    is kept in the buffer and saved with the next one; if it cannot be saved on exit (and the results are not
+    spooled), the error is raised.
 
-        if not config_folder and CONFIG_FOLDER_ENV_VAR_NAME in os.environ :
-            config_folder = os.environ[CONFIG_FOLDER_ENV_VAR_NAME]
+    If results_writer_threads > 0, the results and the errors are saved in background by that number of threads
+    (see ResultsWriter), with at most results_queue_size records waiting. All of them are saved before exiting: the
+    ones whose save failed are retried and, if they still fail (and are not spooled), the error is raised.
 
-        self.configuration = ControllerConfiguration(config_folder)
+    If spool_results is True, the results and the errors are written in a local spool in the data folder before
+    being saved (see ResultsSpool). The ones that cannot be saved, because the storage is not configured or fails,
+    are kept there and can be saved later with replay_spooled_results()
+
+    If logs_by_reference is True, the logs of the results are saved in the log store of the data folder (see
+    LogStore) and the results saved in the storage contain only a reference to them (a LogRef). This is the streaming
+    path for large logs: the logs spilled to a file (see SpilledLogs) are copied to the log store in chunks, without
+    loading them in memory. Otherwise the storage connectors receive the logs as a string, so the spilled logs are
+    loaded in memory before saving the result. In both cases, the spill file is removed.
+    The parsers too receive the logs as a string: unless the parser of the benchmark is incremental (see
+    ExecutionResultParser.new_incremental_parser), the spilled logs are loaded in memory to parse them (if
+    cache_metrics is True, only when their metrics are not in the cache)
+
+    If cache_metrics is True, the metrics extracted from the logs are cached (see MetricsCache) and logs already
+    parsed are not parsed again. The cache is also used by reparse_results()
+
+    If env_pool_max_warm > 0, each new session keeps a pool of the execution environments provisioned (see
+    EnvironmentPool): the environments released by the executions are reused by the next executions with a compatible
+    request, up to env_pool_max_warm idle environments for at most env_pool_ttl seconds. The pool is closed when the
+    session is destroyed
+
+    The prepare of a test is skipped if the same prepare has already been executed on the execution environment and
+    not undone by a cleanup (see Benchmark.get_prepare_script() and Benchmark.cleanup_keeps_prepare), unless
+    force_prepare is True
+
+    If a tracer is given (see tracing.Tracer), the operations of the controller and the phases of the executions are
+    traced as spans. The results and the errors saved in background by the results writer are not traced
+
+    The hooks (see LifecycleHook) are called before and after each phase of the sessions and of the executions. Other
+    hooks can be enabled by name with the BENCHSUITE_HOOKS environment variable (e.g. "cprofile,resources"): they
+    write their reports in the data folder. The hooks are closed on exit
+    """
+
+    def __init__(self, config_folder=None, storage_config_file=None, measure_startup=False,
+                 results_batch_size=1, results_batch_bytes=DEFAULT_BATCH_MAX_BYTES,
+                 results_batch_delay=DEFAULT_BATCH_MAX_DELAY, results_writer_threads=0, results_queue_size=100,
+                 spool_results=False, logs_by_reference=False, cache_metrics=False,
+                 env_pool_max_warm=0, env_pool_ttl=DEFAULT_ENV_POOL_TTL, force_prepare=False,
+                 tracer=None, hooks=None):
+
+        self.measure_startup = measure_startup or MEASURE_STARTUP_ENV_VAR in os.environ
+        self.startup_timings = {}
+        self.__lock = threading.RLock()
+
+        with self.__timed('configuration'):
+
+            if not config_folder and CONFIG_FOLDER_ENV_VAR_NAME in os.environ :
+                config_folder = os.environ[CONFIG_FOLDER_ENV_VAR_NAME]
+
+            self.configuration = ControllerConfiguration(config_folder)
+
+            data_folder = get_data_folder()
+            self.data_folder = data_folder
+
+            enable_compiled_cache(os.path.join(data_folder, COMPILED_CONFIG_CACHE_DIR))
+
+            self.spilled_logs_folder = os.path.join(data_folder, SPILLED_LOGS_DIR)
+
+        self.storage_config_file = storage_config_file
+        self.__session_storage = None
+        self.__results_storage = _NOT_LOADED
+
+        self.results_batch_size = results_batch_size
+        self.results_batch_bytes = results_batch_bytes
+        self.results_batch_delay = results_batch_delay
+        self.__results_buffer = None
+
+        self.results_writer_threads = results_writer_threads
+        self.results_queue_size = results_queue_size
+        self.__results_writer = None
+
+        self.spool_results = spool_results
+        self.__results_spool = None
+
+        self.logs_by_reference = logs_by_reference
+        self.__log_store = None
+
+        self.cache_metrics = cache_metrics
+        self.__metrics_cache = None
+
+        self.env_pool_max_warm = env_pool_max_warm
+        self.env_pool_ttl = env_pool_ttl
+
+        self.force_prepare = force_prepare
+
+        self.tracer = tracer or tracing.NOOP_TRACER
+
+        self.hooks = list(hooks or [])
+        if HOOKS_ENV_VAR_NAME in os.environ:
+            self.hooks.extend(load_hooks(os.environ[HOOKS_ENV_VAR_NAME], os.path.join(data_folder, HOOKS_OUTPUT_DIR)))
+
+    @property
+    def session_storage(self) -> SessionStorageManager:
+        if self.__session_storage is None:
+            with self.__lock:
+                if self.__session_storage is None:
+                    with self.__timed('session_storage'):
+                        session_storage = SessionStorageManager(self.data_folder)
+                        session_storage.load()
+                        self.__session_storage = session_storage
+        return self.__session_storage
+
+    @property
+    def results_storage(self):
+        if self.__results_storage is _NOT_LOADED:
+            with self.__lock:
+                if self.__results_storage is _NOT_LOADED:
+                    with self.__timed('results_storage'):
+                        self.__results_storage = self.__load_results_storage()
+        return self.__results_storage
+
+    @results_storage.setter
+    def results_storage(self, value):
+        self.close_results_writer()
+        self.flush_results()
+        self.__results_storage = value
+        self.__results_buffer = None
+
+    @property
+    def results_buffer(self) -> ResultsBuffer:
+        """the buffer of the results to save, or None if the results are saved one by one"""
+        if self.__results_buffer is None and self.results_batch_size > 1 and self.results_storage:
+            with self.__lock:
+                if self.__results_buffer is None:
+                    self.__results_buffer = ResultsBuffer(self.results_storage, self.results_batch_size,
+                                                          self.results_batch_bytes, self.results_batch_delay,
+                                                          on_saved=self.__mark_delivered)
+        return self.__results_buffer
+
+    def flush_results(self):
+        """saves the buffered results, if any"""
+        if self.__results_buffer is not None:
+            self.__results_buffer.flush()
+
+    @property
+    def results_writer(self) -> ResultsWriter:
+        """the writer that saves the results in background, or None if they are saved synchronously"""
+        if self.__results_writer is None and self.results_writer_threads > 0:
+            with self.__lock:
+                if self.__results_writer is None:
+                    self.__results_writer = ResultsWriter(self.__deliver, self.results_queue_size,
+                                                          self.results_writer_threads)
+        return self.__results_writer
+
+    def close_results_writer(self):
+        """waits until the results writer has saved all the results and stops it"""
+        if self.__results_writer is not None:
+            try:
+                self.__results_writer.close()
+            finally:
+                self.__results_writer = None
+
+    @property
+    def results_spool(self) -> ResultsSpool:
+        """the spool of the results to save, or None if spool_results is False"""
+        if self.__results_spool is None and self.spool_results:
+            self.__results_spool = ResultsSpool(os.path.join(self.data_folder, RESULTS_SPOOL_FILE))
+        return self.__results_spool
+
+    @property
+    def log_store(self) -> LogStore:
+        if self.__log_store is None:
+            self.__log_store = LogStore(os.path.join(self.data_folder, LOG_STORE_DIR))
+        return self.__log_store
+
+    @property
+    def metrics_cache(self) -> MetricsCache:
+        if self.__metrics_cache is None:
+            self.__metrics_cache = MetricsCache(os.path.join(self.data_folder, DEFAULT_METRICS_CACHE_DB))
+        return self.__metrics_cache
+
+    def _save_record(self, kind, record):
+        """
+        Saves an execution result (kind='result') or error (kind='error'), in background if the results writer is
+        enabled
+        """
+        record_id = self.results_spool.append(kind, record) if self.results_spool is not None else None
 
-        data_folder = self.configuration.get_default_data_dir()
-        if DATA_FOLDER_ENV_VAR_NAME in os.environ:
-            data_folder = os.environ[DATA_FOLDER_ENV_VAR_NAME]
+        if not self.results_storage:
+            logger.warning('Results storage not configured. The execution {0} is kept in the spool'.format(kind))
+            return
 
-        self.session_storage = SessionStorageManager(data_folder)
-        self.session_storage.load()
+        if self.results_writer is not None:
+            self.results_writer.submit(kind, record, record_id)
+        else:
+            self.__deliver(kind, record, record_id)
 
+    def __deliver(self, kind, record, record_id=None):
+        try:
+            with tracing.span('save_' + kind):
+                if kind == 'error':
+                    self.results_storage.save_execution_error(record)
+                elif self.results_buffer is not None:
+                    # marked as delivered by the buffer, when saved
+                    self.results_buffer.add(record, record_id)
+                    return
+                else:
+                    self.results_storage.save_execution_result(record)
+
+        except Exception as ex:
+            if record_id is None:
+                raise ex
+            logger.error('Error saving the execution {0} ({1}). It is kept in the spool'.format(kind, str(ex)))
+            return
+
+        self.__mark_delivered([record_id])
+
+    def __mark_delivered(self, record_ids):
+        record_ids = [i for i in record_ids if i is not None]
+        if record_ids and self.results_spool is not None:
+            self.results_spool.mark_delivered(record_ids)
+
+    def replay_spooled_results(self, batch_size=100):
+        """
+        Saves the results and the errors left in the spool because the results storage was not available or failed.
+        :return: the number of results and errors saved
+        """
+        if not self.results_storage:
+            raise ControllerConfigurationException('Results storage not configured')
+
+        spool = self.results_spool or ResultsSpool(os.path.join(self.data_folder, RESULTS_SPOOL_FILE))
+        pending = spool.pending()
+        saved = 0
+
+        try:
+            results = [(i, r) for i, kind, r in pending if kind == 'result']
+            for n in range(0, len(results), batch_size):
+                batch = results[n:n + batch_size]
+                self.results_storage.save_execution_results([r for _, r in batch])
+                spool.mark_delivered([i for i, _ in batch])
+                saved += len(batch)
+
+            for i, kind, r in pending:
+                if kind == 'error':
+                    self.results_storage.save_execution_error(r)
+                    spool.mark_delivered([i])
+                    saved += 1
+        finally:
+            spool.compact()
+
+        logger.info('%d spooled execution results/errors saved (%d still in the spool)', saved, len(pending) - saved)
+        return saved
+
+    def __load_results_storage(self):
+        storage_config_file = self.storage_config_file
         try:
             # different ways to load the storage configuration:
             # 1. use the storage_config_file argument if initialized (the -r option in the CLI)
@@ -72,24 +344,77 @@ class BenchmarkingController:
 
             if storage_config_file:
                 logger.info('Loading storage configuration from file ' + storage_config_file)
-                self.results_storage = load_storage_connector_from_config_file(storage_config_file)
+                return load_storage_connector_from_config_file(storage_config_file)
             elif STORAGE_CONFIG_FILE_ENV_VAR in os.environ:
                 logger.info('Loading storage configuration from {0} env variable'.format(STORAGE_CONFIG_FILE_ENV_VAR))
-                self.results_storage = load_storage_connector_from_config_string(os.environ[STORAGE_CONFIG_FILE_ENV_VAR])
+                return load_storage_connector_from_config_string(os.environ[STORAGE_CONFIG_FILE_ENV_VAR])
             else:
                 logger.info('Loading storage configuration from default location ' + self.configuration.get_storage_config_file())
-                self.results_storage = load_storage_connector_from_config_file(self.configuration.get_storage_config_file())
+                return load_storage_connector_from_config_file(self.configuration.get_storage_config_file())
 
         except ControllerConfigurationException:
             logger.warning('Results storage configuration file not found. Results storage of results is disabled')
-            self.results_storage = None
+            return None
 
+    @contextmanager
+    def __timed(self, component):
+        if not self.measure_startup:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_timings[component] = time.perf_counter() - start
+            logger.info('Startup: %s initialized in %.3f s', component, self.startup_timings[component])
+
+    def get_startup_report(self) -> str:
+        """
+        :return: a report of the time spent to initialize the components loaded so far (if measure_startup is set)
+        """
+        lines = ['{0:<20} {1:>10.3f} s'.format(c, t) for c, t in self.startup_timings.items()]
+        lines.append('{0:<20} {1:>10.3f} s'.format('total', sum(self.startup_timings.values())))
+        return '\n'.join(lines)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.session_storage.store()
+        save_error = None
+        try:
+            self.close_results_writer()
+        except Exception as ex:
+            logger.error('Error saving the execution results in background: {0}'.format(str(ex)))
+            save_error = ex
+        try:
+            self.flush_results()
+        except Exception as ex:
+            logger.error('Error saving the buffered execution results: {0}'.format(str(ex)))
+            save_error = save_error or ex
+        try:
+            if self.__results_spool is not None:
+                self.__results_spool.compact()
+        except Exception as ex:
+            logger.error('Error compacting the results spool: {0}'.format(str(ex)))
+        if self.__session_storage is not None:
+            self.__session_storage.store()
+        if self.__metrics_cache is not None:
+            self.__metrics_cache.close()
+        try:
+            self.tracer.flush()
+        except Exception as ex:
+            logger.error('Error exporting the spans: {0}'.format(str(ex)))
+        for h in self.hooks:
+            try:
+                h.close()
+            except Exception as ex:
+                logger.error('Error closing the hook {0}: {1}'.format(type(h).__name__, str(ex)))
+        if self.measure_startup:
+            logger.info('Controller startup times:\n%s', self.get_startup_report())
+        if save_error is not None and exc_type is None and self.__results_spool is None:
+            # without the spool, the results not saved are lost
+            raise save_error
         return exc_type is None
 
     def list_available_providers(self):
@@ -101,6 +426,14 @@ class BenchmarkingController:
     def get_benchmark_cfg(self, name):
         return self.configuration.get_benchmark_by_name(name)
 
+    def list_available_implementations(self):
+        """
+        Lists the providers, benchmarks, storage connectors and hooks implementations registered by the installed
+        packages (without importing them)
+        """
+        return {r.group: r.list_available()
+                for r in [registry.providers, registry.benchmarks, registry.storage_connectors, registry.hooks]}
+
     #
     # SESSIONS
     #
@@ -119,72 +452,92 @@ class BenchmarkingController:
         if not cloud_service_name and SERVICE_TYPE_STRING_ENV_VAR_NAME in os.environ:
             cloud_service_name = os.environ[SERVICE_TYPE_STRING_ENV_VAR_NAME]
 
-        if not cloud_provider_name:
-            # provider configuration is not provided via argument. Try to load from environment
-            if PROVIDER_STRING_ENV_VAR_NAME in os.environ:
-                provider_config = os.environ[PROVIDER_STRING_ENV_VAR_NAME]
-                p = load_provider_from_config_string(provider_config, cloud_service_name)
+        with self._phase('new_session', provider=cloud_provider_name, service_type=cloud_service_name):
+            if not cloud_provider_name:
+                # provider configuration is not provided via argument. Try to load from environment
+                if PROVIDER_STRING_ENV_VAR_NAME in os.environ:
+                    provider_config = os.environ[PROVIDER_STRING_ENV_VAR_NAME]
+                    p = load_provider_from_config_string(provider_config, cloud_service_name)
 
+                else:
+                    raise ControllerConfigurationException('Provider must be specified either '
+                                                           'via argument (--provider) or via environment '
+                                                           'variable ({0})'.format(PROVIDER_STRING_ENV_VAR_NAME))
             else:
-                raise ControllerConfigurationException('Provider must be specified either '
-                                                       'via argument (--provider) or via environment '
-                                                       'variable ({0})'.format(PROVIDER_STRING_ENV_VAR_NAME))
-        else:
-            c = self.configuration.get_provider_config_file(cloud_provider_name)
-            p = load_service_provider_from_config_file(c, cloud_service_name)
+                c = self.configuration.get_provider_config_file(cloud_provider_name)
+                p = load_service_provider_from_config_file(c, cloud_service_name)
 
-        s = BenchmarkingSession(p)
-        s.add_all_props(properties)
-        self.session_storage.add(s)
-        return s
+            s = BenchmarkingSession(p)
+            s.add_all_props(properties)
+            self.__setup_env_pool(s)
+            self.session_storage.add(s)
+            return s
 
     def new_session_by_config(self, configuration_string: str) -> BenchmarkingSession:
         p = load_provider_from_config(configuration_string)
         s = BenchmarkingSession(p)
+        self.__setup_env_pool(s)
         self.session_storage.add(s)
         return s
 
+    def __setup_env_pool(self, session):
+        if self.env_pool_max_warm > 0:
+            session.env_pool = EnvironmentPool(session.provider, self.env_pool_max_warm, self.env_pool_ttl,
+                                               provider_lock=session.provider_lock())
+
     def destroy_session(self, session_id: str) -> None:
         s = self.get_session(session_id)
         logger.debug('Session loaded: {0}'.format(s))
-        s.destroy()
-        self.session_storage.remove(s)
+        self.__destroy_session(s)
+
+    @contextmanager
+    def _phase(self, phase, span_name=None, **info):
+        """
+        Calls the hooks before and after the phase and traces it as a span (named span_name, if different from the
+        phase)
+        """
+        with run_hooks(self.hooks, phase, info), self.tracer.span(span_name or phase, **info) as span:
+            yield span
+
+    def __destroy_session(self, session):
+        with self._phase('destroy_session', **self.__session_attributes(session)):
+            session.destroy()
+            self.session_storage.remove(session)
+
+    @staticmethod
+    def __session_attributes(session):
+        return {'session_id': session.id, 'provider': session.provider.name,
+                'service_type': session.provider.service_type}
 
     #
     # EXECUTIONS
     #
 
     def list_executions(self):
-        return [item for sublist in self.list_sessions() for item in sublist.list_executions()]
+        return self.session_storage.list_executions()
 
 
     def get_execution(self, exec_id: str, session_id: str = None) -> BenchmarkExecution:
         if session_id:
             return self.session_storage.get(session_id).get_execution(exec_id)
 
-        for s in self.session_storage.list():
-            try:
-                return s.get_execution(exec_id)
-            except:
-                pass
-
-        raise UndefinedExecutionException('Execution with id={0} does not exist'.format(exec_id))
+        return self.session_storage.get_execution(exec_id)
 
     def new_execution(self, session_id: str, tool: str, workload: str) -> BenchmarkExecution:
-        s = self.session_storage.get(session_id)
-        config_file = self.configuration.get_benchmark_config_file(tool)
-        logger.debug('Loading benchmark from configuration file %s', config_file)
-        b = load_benchmark_from_config_file(config_file, tool, workload)
-        e = s.new_execution(b)
-        return e
-
+        return self.new_executions(session_id, tool, [workload])[0]
 
-    def __store_execution_error(self, execution: BenchmarkExecution, exception, phase):
+    def new_executions(self, session_id: str, tool: str, workloads: List[str]) -> List[BenchmarkExecution]:
+        s = self.session_storage.get(session_id)
+        template = self.configuration.get_benchmark_template(tool)
+        logger.debug('Loading benchmarks from configuration file %s', template.config_file)
+        return [s.new_execution(template.new_benchmark(tool, w)) for w in workloads]
 
-        if not self.results_storage:
-            logger.warning('Results storage not configured. The logging of the exception is disabled')
-            return
 
+    def _new_execution_error(self, execution: BenchmarkExecution, exception, phase) -> ExecutionError:
+        """
+        Creates the ExecutionError for the exception. It must be called while the exception is being handled, in
+        order to have the traceback
+        """
         exec_err_obj = ExecutionError()
         exec_err_obj.timestamp = datetime.datetime.now()
         exec_err_obj.tool = execution.test.tool_id
@@ -195,20 +548,33 @@ class BenchmarkingController:
         exec_err_obj.exception_type = type(exception).__name__
         exec_err_obj.exception_data = exception.__dict__
         exec_err_obj.traceback = traceback.format_exc()
-        self.results_storage.save_execution_error(exec_err_obj)
+        return exec_err_obj
 
-    def prepare_execution(self, exec_id, session_id=None):
+    def _store_execution_error(self, execution: BenchmarkExecution, exception, phase):
+
+        if not self.results_storage and self.results_spool is None:
+            logger.warning('Results storage not configured. The logging of the exception is disabled')
+            return
+
+        self._save_record('error', self._new_execution_error(execution, exception, phase))
+
+    def prepare_execution(self, exec_id, session_id=None, force=None):
+        """
+        :param force: execute the prepare even if the execution environment has already been prepared for the same
+        tool. If None, the force_prepare option of the controller is used
+        """
         e = self.get_execution(exec_id, session_id)
         logger.debug("Execution loaded: {0}".format(e))
 
         try:
-            return e.prepare()
+            with self._phase('prepare_execution', **tracing.execution_attributes(e)):
+                return e.prepare(force=self.force_prepare if force is None else force)
 
         except BashCommandExecutionFailedException as ex:
             error_file = 'last_cmd_error_{0}.dump'.format(exec_id)
             logger.error('Exception executing commands, dumping to {0}'.format(error_file))
             dump_BashCommandExecution_exception(ex, error_file)
-            self.__store_execution_error(e, ex, 'prepare')
+            self._store_execution_error(e, ex, 'prepare')
             logger.info('Continuing with the next test')
             raise ex
 
@@ -216,39 +582,98 @@ class BenchmarkingController:
         e = self.get_execution(exec_id, session_id)
 
         try:
-            r = e.execute(_async=_async)
+            with self._phase('run_execution', **tracing.execution_attributes(e)):
+                r = e.execute(_async=_async)
 
         except BashCommandExecutionFailedException as ex:
             error_file = 'last_cmd_error_{0}.dump'.format(exec_id)
             logger.error('Exception executing commands, dumping to {0}'.format(error_file))
             dump_BashCommandExecution_exception(ex, error_file)
-            self.__store_execution_error(e, ex, 'run')
+            self._store_execution_error(e, ex, 'run')
             raise ex
 
         except Exception as ex:
-            self.__store_execution_error(e, ex, 'run')
+            self._store_execution_error(e, ex, 'run')
             raise ex
 
         if not _async:
             try:
                 self.store_execution_result(exec_id)
             except Exception as ex:
-                self.__store_execution_error(e, ex, 'parsing')
+                self._store_execution_error(e, ex, 'parsing')
                 raise ex
 
         return r
 
+    def run_execution_repeated(self, exec_id, repetition: RepetitionPolicy, session_id=None):
+        """
+        Runs the execution several times, on the same execution environment, as defined by the repetition policy.
+        The results of the measured runs are merged and stored as a single result (see aggregate_results()): the logs
+        are the ones of the last run
+        """
+        e = self.get_execution(exec_id, session_id)
+
+        with self._phase('run_execution', 'run_execution_repeated', **tracing.execution_attributes(e)) as span:
+            for i in range(repetition.warmup_runs):
+                logger.debug('Warmup run %d/%d of %s', i + 1, repetition.warmup_runs, exec_id)
+                self.__run_once(e, warmup=True)
+
+            results = []
+            samples = []
+            start = time.time()
+            while True:
+                self.__run_once(e)
+                try:
+                    r = self._new_execution_result(e)
+                    samples.append(repetition.get_sample(r))
+                except Exception as ex:
+                    self._store_execution_error(e, ex, 'parsing')
+                    raise ex
+                # only the logs of the last run are kept (see aggregate_results())
+                if results:
+                    results[-1].logs = None
+                results.append(r)
+
+                reason = repetition.stop_reason(samples, time.time() - start)
+                if reason:
+                    break
+
+            logger.info('%s executed %d times (stopped by %s)', exec_id, len(results), reason)
+            span.set_attribute('runs', len(results))
+            span.set_attribute('stop_reason', reason)
+            r = aggregate_results(results, repetition, reason)
+            if self.results_storage or self.results_spool is not None:
+                self._save_record('result', r)
+            return r
+
+    def __run_once(self, execution, warmup=False):
+        try:
+            with tracing.span('run', warmup=warmup):
+                return execution.execute()
+
+        except BashCommandExecutionFailedException as ex:
+            error_file = 'last_cmd_error_{0}.dump'.format(execution.id)
+            logger.error('Exception executing commands, dumping to {0}'.format(error_file))
+            dump_BashCommandExecution_exception(ex, error_file)
+            self._store_execution_error(execution, ex, 'run')
+            raise ex
+
+        except Exception as ex:
+            self._store_execution_error(execution, ex, 'run')
+            raise ex
+
     def cleanup_execution(self, exec_id, session_id=None):
         e = self.get_execution(exec_id, session_id)
 
         try:
-            return e.cleanup()
+            with self._phase('cleanup_execution', **tracing.execution_attributes(e)):
+                return e.cleanup()
 
         except BashCommandExecutionFailedException as ex:
             error_file = 'last_cmd_error_{0}.dump'.format(exec_id)
             logger.error('Exception executing commands, dumping to {0}'.format(error_file))
             dump_BashCommandExecution_exception(ex, error_file)
-            self.__store_execution_error(e, ex, 'prepare')
+            self._store_execution_error(e, ex, 'prepare')
             logger.info('Continuing with the next test')
             raise ex
 
@@ -256,11 +681,174 @@ class BenchmarkingController:
         e = self.get_execution(exec_id, session_id)
         return e.collect_result()
 
+    def _new_execution_result(self, execution: BenchmarkExecution) -> ExecutionResult:
+        try:
+            r = execution.get_execution_result(spill_folder=self.spilled_logs_folder,
+                                               metrics_cache=self.metrics_cache if self.cache_metrics else None)
+        except ParsingException as ex:
+            # the logs are stored with the error
+            if isinstance(ex.logs, SpilledLogs):
+                ex.logs = self.__consume_spilled_logs(ex.logs, ex.logs.read)
+            raise ex
+
+        if self.logs_by_reference and r.logs is not None:
+            if isinstance(r.logs, SpilledLogs):
+                r.logs = self.__consume_spilled_logs(r.logs, functools.partial(self.log_store.put, r.logs))
+            else:
+                r.logs = self.log_store.put(r.logs)
+        elif isinstance(r.logs, SpilledLogs):
+            logger.warning('Loading in memory the logs of execution %s (%d bytes) to save them: set logs_by_reference '
+                           'to stream them to the log store', execution.id, r.logs.size)
+            r.logs = self.__consume_spilled_logs(r.logs, r.logs.read)
+        return r
+
+    @staticmethod
+    def __consume_spilled_logs(logs, consume):
+        # the storage connectors never receive the spill files (that exist only on this host): they are removed once
+        # stored in the log store or loaded in memory
+        consumed = consume()
+        try:
+            logs.remove()
+        except OSError as ex:
+            logger.warning('Error removing {0}: {1}'.format(logs.file, str(ex)))
+        return consumed
+
+    def reparse_results(self, results=None, max_workers=None, force=False):
+        """
+        Extracts again the metrics from the logs of the results, with the parsers currently configured, in a pool of
+        max_workers processes. The logs already parsed by the same version of the parser are not parsed again (the
+        metrics are taken from the metrics cache), unless force is True.
+        :param results: ExecutionResult objects or dictionaries with the same fields. If None, all the results in the
+        results storage (it must support query(), e.g. SimpleFileBackend)
+        :return: the results with the new metrics. They are not saved in the storage
+        """
+        if results is None:
+            if not hasattr(self.results_storage, 'query'):
+                raise ControllerConfigurationException('The results storage does not support reading the results')
+            results = self.results_storage.query()
+
+        parsers = {}
+        reparsed = []
+        counters = {'cached': 0, 'parsed': 0, 'failed': 0}
+        start = time.perf_counter()
+
+        # at most max_pending logs in memory
+        max_pending = (max_workers or os.cpu_count() or 1) * 2
+
+        with ProcessPoolExecutor(max_workers) as executor:
+            # the results waiting for each future and the future of each logs being parsed, so that the same logs
+            # are parsed only once
+            pending = {}
+            in_progress = {}
+
+            for r in results:
+                job = self.__reparse_job(r, parsers)
+                if not job:
+                    counters['failed'] += 1
+                    continue
+
+                parser, tool, workload, logs, h = job
+                # h is None if the logs cannot be hashed: they are always parsed
+                metrics = None if force or h is None else self.metrics_cache.get(parser, tool, workload, h)
+                if metrics is not None:
+                    self.__set_metrics(r, metrics)
+                    reparsed.append(r)
+                    counters['cached'] += 1
+                    continue
+
+                key = (parser_key(parser), tool, workload, h)
+                if key in in_progress:
+                    pending[in_progress[key]].append(r)
+                    continue
+
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        self.__reparse_done(f, pending.pop(f), in_progress, reparsed, counters)
+
+                f = executor.submit(parse_logs, parser, tool, workload, self.__read_logs(logs))
+                pending[f] = [job, r]
+                if h is not None:
+                    in_progress[key] = f
+
+            for f in list(pending):
+                self.__reparse_done(f, pending.pop(f), in_progress, reparsed, counters)
+
+        logger.info('%d results reparsed in %.1f s (%d parsed, %d from the cache, %d failed)', len(reparsed),
+                    time.perf_counter() - start, counters['parsed'], counters['cached'], counters['failed'])
+        return reparsed
+
+    def __reparse_job(self, result, parsers):
+        get = result.get if isinstance(result, dict) else functools.partial(getattr, result)
+        tool, workload, logs = get('tool', None), get('workload', None), get('logs', None)
+
+        if isinstance(logs, dict):
+            if 'chunks' not in logs:
+                logger.warning('Unknown format of the logs of %s/%s. Not reparsed', tool, workload)
+                return None
+            logs = LogRef.from_dict(logs)
+        if logs is None:
+            logger.warning('The result of %s/%s has no logs. Not reparsed', tool, workload)
+            return None
+
+        if (tool, workload) not in parsers:
+            try:
+                parsers[tool, workload] = self.configuration.get_benchmark_template(tool).new_benchmark(
+                    tool, workload).parser
+            except Exception as ex:
+                logger.warning('Impossible to load the parser of %s/%s: %s', tool, workload, str(ex))
+                parsers[tool, workload] = None
+
+        parser = parsers[tool, workload]
+        if not parser:
+            return None
+
+        try:
+            return parser, tool, workload, logs, logs_hash(logs)
+        except OSError as ex:
+            logger.warning('Impossible to read the logs of %s/%s: %s', tool, workload, str(ex))
+            return None
+
+    def __read_logs(self, logs):
+        if isinstance(logs, LogRef):
+            return self.log_store.read(logs)
+        if isinstance(logs, (bytes, bytearray)):
+            return logs.decode('utf-8', 'replace')
+        return logs
+
+    def __reparse_done(self, future, waiting, in_progress, reparsed, counters):
+        (parser, tool, workload, _, h), results = waiting[0], waiting[1:]
+        in_progress.pop((parser_key(parser), tool, workload, h), None)
+        try:
+            metrics = future.result()
+        except Exception as ex:
+            logger.warning('Error parsing the logs of %s/%s: %s', tool, workload, str(ex))
+            counters['failed'] += len(results)
+            return
+
+        if h is not None:
+            self.metrics_cache.put(parser, tool, workload, h, metrics)
+        for r in results:
+            self.__set_metrics(r, metrics)
+            reparsed.append(r)
+        counters['parsed'] += 1
+        counters['cached'] += len(results) - 1
+
+    @staticmethod
+    def __set_metrics(result, metrics):
+        old = result.get('metrics') if isinstance(result, dict) else result.metrics
+        new = {'duration': old['duration']} if old and 'duration' in old else {}
+        new.update(metrics)
+        if isinstance(result, dict):
+            result['metrics'] = new
+        else:
+            result.metrics = new
+
     def store_execution_result(self, exec_id, session_id=None):
         e = self.get_execution(exec_id, session_id)
-        if self.results_storage:
-            r = e.get_execution_result()
-            self.results_storage.save_execution_result(r)
+        if self.results_storage or self.results_spool is not None:
+            with self._phase('store_execution_result', **tracing.execution_attributes(e)):
+                self._save_record('result', self._new_execution_result(e))
         else:
             logger.warning('Result Storage not configured. Storage of results is disabled.')
 
@@ -273,58 +861,206 @@ class BenchmarkingController:
                         new_session_props={},
                         fail_on_error=False,
                         destroy_session=True,
-                        max_retry=1) -> None:
+                        max_retry=1,
+                        max_workers=1,
+                        pipelined=False,
+                        repetition: RepetitionPolicy = None) -> None:
+        """
+        Executes all the tests on all the service types of the provider (or only on service_type if specified).
+
+        If max_workers > 1, the sessions (one per service type) and the executions inside each session run in
+        parallel using up to max_workers threads for the executions. The execution environments of each session are
+        still requested to (and released by) the provider one at a time, unless the provider is thread safe (see
+        ServiceProvider.thread_safe).
+
+        If pipelined is True, the tests of each session are executed in order, but the prepare of the next test and
+        the cleanup of the previous one overlap with the run of the current test. It takes precedence over the
+        parallel execution of the tests (the sessions still run in parallel if max_workers > 1)
+
+        If repetition is set, each test is executed several times after being prepared, as defined by the policy
+        (see run_execution_repeated())
+        """
 
         if not service_type:
             s_types = self.configuration.get_provider_by_name(provider).service_types
         else:
             s_types = [service_type]
 
-        for st in s_types:
-            session = self.new_session(provider, st, properties=new_session_props)
+        with self.tracer.span('execute_onestep', provider=provider, max_workers=max_workers, pipelined=pipelined):
+            if max_workers <= 1:
+                for st in s_types:
+                    self.__execute_session(provider, st, tests, new_session_props, fail_on_error, destroy_session,
+                                           max_retry, pipelined, repetition)
+                return
+
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='benchsuite-exec') as executions_pool, \
+                    ThreadPoolExecutor(max_workers=len(s_types),
+                                       thread_name_prefix='benchsuite-session') as sessions_pool:
+                futures = [sessions_pool.submit(tracing.propagate(self.__execute_session), provider, st, tests,
+                                                new_session_props, fail_on_error, destroy_session, max_retry,
+                                                pipelined, repetition, executions_pool)
+                           for st in s_types]
+                self.__wait_all(futures)
+
+    def __execute_session(self, provider, service_type, tests, new_session_props, fail_on_error, destroy_session,
+                          max_retry, pipelined=False, repetition=None, executions_pool=None):
+
+        with tracing.span('session', provider=provider, service_type=service_type):
+            session = self.new_session(provider, service_type, properties=new_session_props)
             try:
 
-                for tool, workload in tests:
-
-                    if not workload:
-                        workloads = [ w['id'] for w in self.configuration.get_benchmark_by_name(tool).workloads]
-                    else:
-                        if re.search(r'\*|\?', workload):
-                            workloads = self.configuration.get_benchmark_by_name(tool).find_workloads(workload)
-                        else:
-                            workloads = [workload]
-
-                    for w in workloads:
-                        execution = self.new_execution(session.id, tool, w)
-
-                        retry_counter = max_retry
-
-                        while retry_counter > 0:
-                            retry_counter -= 1
-                            try:
-                                self.prepare_execution(execution.id)
-                                self.run_execution(execution.id)
-                                self.cleanup_execution(execution.id)
-                                break
-
-                            except Exception as ex:
-                                if retry_counter > 0:
-                                    msg = 'Retrying to execute the test for other {0} times'.format(retry_counter)
-                                    logger.error('Unhandled exception ({0}) running {1}:{2}. {3}'.format(str(ex), tool, w, msg))
-                                else:
-                                    msg = 'Max retry count ({0}) exceeded. Ignoring and continuing with the next test'.format(max_retry)
-                                    logger.error('Unhandled exception ({0}) running {1}:{2}. {3}'.format(str(ex), tool, w, msg))
-                                    self.__store_execution_error(execution, ex, 'create')
-                                    if fail_on_error:
-                                        logger.error('Unhandled exception({0}) running {1}:{2}. '
-                                                     'Stopping here because "--failonerror" option is set'.format(str(ex), tool, w))
-                                        raise ex
+                tests = [(tool, w) for tool, workload in tests for w in self.__expand_workloads(tool, workload)]
+
+                if pipelined:
+                    self.__execute_pipelined(session, tests, max_retry, fail_on_error, repetition)
+                elif not executions_pool:
+                    for tool, w in tests:
+                        self.__execute_test(session, tool, w, max_retry, fail_on_error, repetition)
+                else:
+                    futures = [executions_pool.submit(tracing.propagate(self.__execute_test), session, tool, w,
+                                                      max_retry, fail_on_error, repetition)
+                               for tool, w in tests]
+                    self.__wait_all(futures)
+
             except Exception as ex:
                 raise ex
 
             finally:  # make sure to always destroy the VMs created
                 if destroy_session:
-                    session.destroy()
-                    self.session_storage.remove(session)
+                    self.__destroy_session(session)
                 else:
                     logger.warn('Not deleting session because the "--keep-env" flag is set')
+
+    def __expand_workloads(self, tool, workload):
+
+        if not workload:
+            return [w['id'] for w in self.configuration.get_benchmark_by_name(tool).workloads]
+
+        if re.search(r'\*|\?', workload):
+            return self.configuration.get_benchmark_by_name(tool).find_workloads(workload)
+
+        return [workload]
+
+    def __execute_test(self, session, tool, w, max_retry, fail_on_error, repetition=None):
+        with tracing.span('test', tool=tool, workload=w):
+            execution = self.new_execution(session.id, tool, w)
+            self.__execute_with_retry(execution, tool, w, max_retry, fail_on_error, repetition=repetition)
+
+    def __run(self, execution, repetition):
+        if repetition:
+            return self.run_execution_repeated(execution.id, repetition)
+        return self.run_execution(execution.id)
+
+    def __execute_with_retry(self, execution, tool, w, max_retry, fail_on_error, retry_counter=None,
+                             repetition=None):
+
+        if retry_counter is None:
+            retry_counter = max_retry
+
+        while retry_counter > 0:
+            retry_counter -= 1
+            try:
+                self.prepare_execution(execution.id)
+                self.__run(execution, repetition)
+                self.cleanup_execution(execution.id)
+                break
+
+            except Exception as ex:
+                self.__handle_test_failure(execution, tool, w, ex, retry_counter, max_retry, fail_on_error)
+
+    def __handle_test_failure(self, execution, tool, w, ex, retry_counter, max_retry, fail_on_error):
+        if retry_counter > 0:
+            msg = 'Retrying to execute the test for other {0} times'.format(retry_counter)
+            logger.error('Unhandled exception ({0}) running {1}:{2}. {3}'.format(str(ex), tool, w, msg))
+        else:
+            msg = 'Max retry count ({0}) exceeded. Ignoring and continuing with the next test'.format(max_retry)
+            logger.error('Unhandled exception ({0}) running {1}:{2}. {3}'.format(str(ex), tool, w, msg))
+            self._store_execution_error(execution, ex, 'create')
+            if fail_on_error:
+                logger.error('Unhandled exception({0}) running {1}:{2}. '
+                             'Stopping here because "--failonerror" option is set'.format(str(ex), tool, w))
+                raise ex
+
+    def __execute_pipelined(self, session, tests, max_retry, fail_on_error, repetition=None):
+        """
+        Executes the tests in three stages: while test N runs (in the current thread), test N+1 is prepared and
+        test N-1 is cleaned up in background.
+
+        The runs never overlap: if the prepare or the run of a test fails, its remaining retries are executed in the
+        current thread before running the next test, so that the order of the tests is not altered. A failure of the
+        cleanup is detected while the next test runs: the retries of that test are executed right after it
+        """
+
+        def prepare(tool, w):
+            execution = self.new_execution(session.id, tool, w)
+            try:
+                self.prepare_execution(execution.id)
+                return execution, None
+            except Exception as ex:
+                return execution, ex
+
+        def cleanup(execution):
+            try:
+                self.cleanup_execution(execution.id)
+                return None
+            except Exception as ex:
+                return ex
+
+        def retry(execution, tool, w, error):
+            self.__handle_test_failure(execution, tool, w, error, max_retry - 1, max_retry, fail_on_error)
+            self.__execute_with_retry(execution, tool, w, max_retry, fail_on_error, retry_counter=max_retry - 1,
+                                      repetition=repetition)
+
+        def retry_failed_cleanups(cleanups, wait_all=False):
+            for entry in list(cleanups):
+                f, execution, tool, w = entry
+                if wait_all or f.done():
+                    cleanups.remove(entry)
+                    error = f.result()
+                    if error:
+                        retry(execution, tool, w, error)
+
+        if not tests:
+            return
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='benchsuite-prepare') as prepare_stage, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix='benchsuite-cleanup') as cleanup_stage:
+
+            cleanups = []
+            next_prepare = prepare_stage.submit(tracing.propagate(prepare), *tests[0])
+
+            for i, (tool, w) in enumerate(tests):
+                execution, error = next_prepare.result()
+
+                if i + 1 < len(tests):
+                    next_prepare = prepare_stage.submit(tracing.propagate(prepare), *tests[i + 1])
+
+                # the retries of the tests whose cleanup failed are executed before the next run
+                retry_failed_cleanups(cleanups)
+
+                if not error:
+                    try:
+                        self.__run(execution, repetition)
+                    except Exception as ex:
+                        error = ex
+
+                if error:
+                    retry(execution, tool, w, error)
+                else:
+                    cleanups.append((cleanup_stage.submit(tracing.propagate(cleanup), execution), execution, tool, w))
+
+            retry_failed_cleanups(cleanups, wait_all=True)
+
+    @staticmethod
+    def __wait_all(futures):
+        """
+        Waits for all the futures to complete. On the first failure, the pending ones are cancelled, the running ones
+        are waited and the exception is re-raised
+        """
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        errors = [f.exception() for f in done if f.exception()]
+        if errors:
+            for f in not_done:
+                f.cancel()
+            wait(not_done)
+            raise errors[0]
@@ -0,0 +1,377 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from benchsuite.core import registry
+
+logger = logging.getLogger(__name__)
+
+
+#
+# Hooks called by the BenchmarkingController before and after each phase of the lifecycle of the sessions and of the
+# executions, to observe the controller without subclassing it (e.g. to profile it).
+#
+# The hooks are passed to the controller or listed (comma separated) in the BENCHSUITE_HOOKS environment variable,
+# by dotted class name or by the name of an entry point in the benchsuite.hooks group. The built-in ones are
+# "cprofile", "tracemalloc" and "resources"
+#
+
+PHASES = ('new_session', 'destroy_session', 'prepare_execution', 'run_execution', 'cleanup_execution',
+          'store_execution_result')
+
+
+class LifecycleHook:
+    """
+    Base class of the hooks. For each phase (see PHASES), before_<phase>(info) is called before the phase and
+    after_<phase>(info, error) after it, if implemented. info is a dictionary that describes the session or the
+    execution (e.g. exec_id, tool, workload, provider), error the exception raised by the phase or None.
+
+    Subclasses that handle all the phases in the same way can override before() and after() instead. The value
+    returned by before() is passed to the after() of the same phase as state: the phases can overlap (e.g. parallel
+    executions or the executions of the async controller, in the same thread), so the state of a phase must be kept
+    there and not, e.g., in thread locals.
+
+    The hooks are called in the threads that execute the phases: if the executions run in parallel, they must be
+    thread safe
+    """
+
+    before_new_session = None
+    after_new_session = None
+    before_destroy_session = None
+    after_destroy_session = None
+    before_prepare_execution = None
+    after_prepare_execution = None
+    before_run_execution = None
+    after_run_execution = None
+    before_cleanup_execution = None
+    after_cleanup_execution = None
+    before_store_execution_result = None
+    after_store_execution_result = None
+
+    def __init__(self, output_folder=None):
+        """
+        :param output_folder: where the hook writes its reports when closed (if it writes any)
+        """
+        self.output_folder = output_folder
+
+    def before(self, phase, info):
+        """
+        :return: the state passed to after()
+        """
+        callback = getattr(self, 'before_' + phase, None)
+        if callback:
+            return callback(info)
+
+    def after(self, phase, info, error, state=None):
+        callback = getattr(self, 'after_' + phase, None)
+        if callback:
+            callback(info, error)
+
+    def close(self):
+        """
+        Called when the controller exits
+        """
+        pass
+
+    def _output_file(self, name):
+        os.makedirs(self.output_folder, exist_ok=True)
+        return os.path.join(self.output_folder, name)
+
+    @classmethod
+    def load_from_config(cls, config):
+        return cls(output_folder=config.get('output_folder'))
+
+
+@contextmanager
+def run_hooks(hooks, phase, info):
+    """
+    Calls the before() of the hooks, executes the body and calls their after() in reverse order, also if the body
+    fails. The errors of the hooks are logged and ignored (after() is called with state None if before() failed)
+    """
+    if not hooks:
+        yield
+        return
+
+    states = []
+    for h in hooks:
+        state = None
+        try:
+            state = h.before(phase, info)
+        except Exception as ex:
+            logger.warning('Error in %s before %s: %s', type(h).__name__, phase, str(ex))
+        states.append(state)
+
+    error = None
+    try:
+        yield
+    except BaseException as ex:
+        error = ex
+        raise
+    finally:
+        for h, state in reversed(list(zip(hooks, states))):
+            try:
+                h.after(phase, info, error, state)
+            except Exception as ex:
+                logger.warning('Error in %s after %s: %s', type(h).__name__, phase, str(ex))
+
+
+def load_hooks(names, output_folder=None):
+    """
+    :param names: comma separated names of the hooks (dotted class names or entry points of the benchsuite.hooks
+    group)
+    :return: the hooks, created with their load_from_config()
+    """
+    return [registry.hooks.resolve(n.strip()).load_from_config({'output_folder': output_folder})
+            for n in names.split(',') if n.strip()]
+
+
+class CProfileHook(LifecycleHook):
+    """
+    Profiles the controller process with cProfile during each phase. The profiles of the same phase are merged:
+    stats(phase) returns them and, when the hook is closed, they are written in the output folder (one
+    cprofile-<phase>.prof file for each phase, readable with pstats or snakeviz).
+
+    Only one profiler can be active at a time: when phases overlap (e.g. parallel executions) only the first one is
+    profiled and the others are counted in skipped
+    """
+
+    def __init__(self, output_folder=None):
+        super().__init__(output_folder)
+        self.skipped = 0
+        self.__stats = {}
+        self.__profiling = threading.Lock()
+        self.__stats_lock = threading.Lock()
+
+    def before(self, phase, info):
+        profile = None
+        if self.__profiling.acquire(blocking=False):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # another profiler (not managed by this hook) is active
+                self.__profiling.release()
+                profile = None
+
+        if not profile:
+            with self.__stats_lock:
+                self.skipped += 1
+        return profile
+
+    def after(self, phase, info, error, state=None):
+        profile = state
+        if not profile:
+            return
+
+        profile.disable()
+        self.__profiling.release()
+        with self.__stats_lock:
+            if phase in self.__stats:
+                self.__stats[phase].add(profile)
+            else:
+                self.__stats[phase] = pstats.Stats(profile)
+
+    def stats(self, phase) -> pstats.Stats:
+        """
+        :return: the merged profiles of the phase or None if the phase has not been profiled
+        """
+        return self.__stats.get(phase)
+
+    def close(self):
+        if not self.output_folder:
+            return
+        with self.__stats_lock:
+            for phase, stats in self.__stats.items():
+                stats.dump_stats(self._output_file('cprofile-{0}.prof'.format(phase)))
+        logger.info('cProfile stats written in %s', self.output_folder)
+
+
+# added in Python 3.9: without it, the peak of a phase cannot be measured
+_reset_peak = getattr(tracemalloc, 'reset_peak', None)
+
+
+class TracemallocHook(LifecycleHook):
+    """
+    Traces the memory allocated by the controller process with tracemalloc during each phase. For each phase a record
+    is added to records with the difference of the traced memory (size_diff) and its peak during the phase (peak, only
+    on Python >= 3.9), in bytes. If top > 0, a snapshot is taken before and after the phase and the top source lines by allocated memory
+    are added to the record (this is expensive).
+
+    tracemalloc traces all the threads: when phases overlap, their values include the allocations of each other.
+    When the hook is closed, the records are written in tracemalloc.json in the output folder
+    """
+
+    def __init__(self, output_folder=None, top=0, nframes=1):
+        super().__init__(output_folder)
+        self.top = top
+        self.nframes = nframes
+        self.records = []
+        self.__started = False
+        self.__lock = threading.Lock()
+
+    def before(self, phase, info):
+        with self.__lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.nframes)
+                self.__started = True
+
+        snapshot = tracemalloc.take_snapshot() if self.top > 0 else None
+        if _reset_peak:
+            _reset_peak()
+        return tracemalloc.get_traced_memory()[0], snapshot
+
+    def after(self, phase, info, error, state=None):
+        if not state:
+            return
+        size, peak = tracemalloc.get_traced_memory()
+        start_size, start_snapshot = state
+
+        record = dict(info, phase=phase, failed=error is not None, size_diff=size - start_size,
+                      peak=peak - start_size if _reset_peak else None)
+        if start_snapshot:
+            diff = tracemalloc.take_snapshot().compare_to(start_snapshot, 'lineno')
+            record['top'] = [str(s) for s in diff[:self.top]]
+
+        with self.__lock:
+            self.records.append(record)
+
+    def close(self):
+        with self.__lock:
+            if self.__started:
+                tracemalloc.stop()
+                self.__started = False
+
+        if self.output_folder:
+            with open(self._output_file('tracemalloc.json'), 'w') as f:
+                json.dump(self.records, f, indent=2, default=str)
+
+    @classmethod
+    def load_from_config(cls, config):
+        return cls(output_folder=config.get('output_folder'), top=int(config.get('top', 0)))
+
+
+def _current_rss():
+    """
+    :return: the resident set size of the process in bytes (the maximum one if psutil is not installed and /proc is
+    not available)
+    """
+    if psutil:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, kilobytes on the other systems
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+class ResourceSamplerHook(LifecycleHook):
+    """
+    Measures the CPU time and the memory (RSS) of the controller process during each phase. The RSS is sampled every
+    interval seconds by a background thread. For each phase a record is added to records with the wall time, the user
+    and system CPU time (seconds), the CPU utilization (percent of one core) and the RSS at the start, at the end and
+    the maximum sampled (bytes).
+
+    The values are of the whole process: when phases overlap, they include the work of each other. psutil is used, if
+    installed, to read the RSS. When the hook is closed, the records are written in resources.json in the output
+    folder
+    """
+
+    def __init__(self, output_folder=None, interval=0.1):
+        super().__init__(output_folder)
+        self.interval = interval
+        self.records = []
+        self.__active = []
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__sampler = None
+
+    def before(self, phase, info):
+        t = os.times()
+        rss = _current_rss()
+        record = dict(info, phase=phase, rss_start=rss, rss_max=rss)
+        with self.__lock:
+            self.__active.append(record)
+            if not self.__sampler:
+                self.__sampler = threading.Thread(target=self.__sample, name='benchsuite-resource-sampler',
+                                                  daemon=True)
+                self.__sampler.start()
+
+        return record, time.perf_counter(), t
+
+    def after(self, phase, info, error, state=None):
+        if not state:
+            return
+        t = os.times()
+        end = time.perf_counter()
+        rss = _current_rss()
+        record, start, start_t = state
+
+        record['failed'] = error is not None
+        record['wall'] = end - start
+        record['cpu_user'] = t.user - start_t.user
+        record['cpu_system'] = t.system - start_t.system
+        record['cpu_percent'] = 100 * (record['cpu_user'] + record['cpu_system']) / record['wall'] \
+            if record['wall'] > 0 else 0
+        record['rss_end'] = rss
+        with self.__lock:
+            record['rss_max'] = max(record['rss_max'], rss)
+            self.__active.remove(record)
+            self.records.append(record)
+
+    def __sample(self):
+        while not self.__stop.wait(self.interval):
+            try:
+                rss = _current_rss()
+            except Exception as ex:
+                logger.warning('Error reading the RSS: %s', str(ex))
+                continue
+            with self.__lock:
+                for r in self.__active:
+                    r['rss_max'] = max(r['rss_max'], rss)
+
+    def close(self):
+        self.__stop.set()
+        if self.__sampler:
+            self.__sampler.join()
+
+        if self.output_folder:
+            with open(self._output_file('resources.json'), 'w') as f:
+                json.dump(self.records, f, indent=2, default=str)
+
+    @classmethod
+    def load_from_config(cls, config):
+        return cls(output_folder=config.get('output_folder'), interval=float(config.get('interval', 0.1)))
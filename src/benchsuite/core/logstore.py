@@ -0,0 +1,163 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import hashlib
+import logging
+import os
+import tempfile
+import zlib
+
+logger = logging.getLogger(__name__)
+
+#
+# Content-addressed storage of the execution logs.
+#
+# The logs are split in chunks with boundaries that depend only on the content (so that the same portions of similar
+# logs produce the same chunks), each chunk is compressed with zlib and stored in a file named after the sha256 of
+# its content. A chunk already present is not written again. The results keep only a LogRef with the list of the
+# chunks.
+#
+# The boundaries are chosen at the end of lines (the logs are line oriented): a line ends a chunk if the crc32 of the
+# line is lower than a threshold proportional to the length of the line, so that the chunks are avg_chunk_size bytes
+# on average. Chunks are never shorter than avg_chunk_size / 4 and longer than avg_chunk_size * 4.
+#
+
+DEFAULT_AVG_CHUNK_SIZE = 64 * 1024
+
+COMPRESSION_LEVEL = 6
+
+
+class LogRef:
+    """
+    A reference to the logs in the LogStore
+    """
+
+    def __init__(self, chunks, size, sha256):
+        self.chunks = chunks
+        self.size = size
+        self.sha256 = sha256
+
+    @staticmethod
+    def from_dict(data):
+        return LogRef(data['chunks'], data['size'], data['sha256'])
+
+    def __json__(self):
+        return {'chunks': self.chunks, 'size': self.size, 'sha256': self.sha256}
+
+    def __str__(self) -> str:
+        return '<logs {0} ({1} bytes, {2} chunks)>'.format(self.sha256, self.size, len(self.chunks))
+
+
+class LogStore:
+
+    def __init__(self, folder, avg_chunk_size=DEFAULT_AVG_CHUNK_SIZE):
+        self.folder = folder
+        self.avg_chunk_size = avg_chunk_size
+        self.min_chunk_size = avg_chunk_size // 4
+        self.max_chunk_size = avg_chunk_size * 4
+        os.makedirs(folder, exist_ok=True)
+
+    def put(self, logs) -> LogRef:
+        """
+        :param logs: a string, bytes or an object with a chunks() method that returns the logs in chunks (e.g.
+        SpilledLogs)
+        """
+        digest = hashlib.sha256()
+        chunks = []
+        size = 0
+        written = 0
+        for chunk in self.__split(self.__lines(logs)):
+            digest.update(chunk)
+            size += len(chunk)
+            key = hashlib.sha256(chunk).hexdigest()
+            if self.__write_chunk(key, chunk):
+                written += 1
+            chunks.append(key)
+
+        logger.debug('Logs of %d bytes stored in %d chunks (%d new)', size, len(chunks), written)
+        return LogRef(chunks, size, digest.hexdigest())
+
+    def read(self, ref) -> str:
+        """
+        :param ref: a LogRef or its json representation (e.g. read from the storage)
+        """
+        return b''.join(self.read_chunks(ref)).decode('utf-8', 'replace')
+
+    def read_chunks(self, ref):
+        if isinstance(ref, dict):
+            ref = LogRef.from_dict(ref)
+        for key in ref.chunks:
+            with open(self.__chunk_path(key), 'rb') as f:
+                yield zlib.decompress(f.read())
+
+    def __chunk_path(self, key):
+        return os.path.join(self.folder, key[:2], key + '.z')
+
+    def __write_chunk(self, key, chunk):
+        path = self.__chunk_path(key)
+        if os.path.exists(path):
+            return False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(zlib.compress(chunk, COMPRESSION_LEVEL))
+        os.replace(tmp_file, path)
+        return True
+
+    @staticmethod
+    def __lines(logs):
+        if isinstance(logs, str):
+            logs = logs.encode('utf-8')
+        if isinstance(logs, bytes):
+            yield from logs.splitlines(keepends=True)
+            return
+
+        # a stream of chunks: lines can span several chunks
+        tail = b''
+        for chunk in logs.chunks():
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            lines = (tail + chunk).splitlines(keepends=True)
+            tail = lines.pop() if lines and not lines[-1].endswith((b'\n', b'\r')) else b''
+            yield from lines
+        if tail:
+            yield tail
+
+    def __split(self, lines):
+        # probability that a line ends a chunk: line length / avg_chunk_size, compared with the crc32 of the line
+        threshold = (1 << 32) / self.avg_chunk_size
+        buffer = []
+        size = 0
+        for line in lines:
+            while size + len(line) > self.max_chunk_size:
+                # very long line (or no boundary found): cut at the maximum size
+                cut = self.max_chunk_size - size
+                buffer.append(line[:cut])
+                yield b''.join(buffer)
+                buffer, size, line = [], 0, line[cut:]
+
+            buffer.append(line)
+            size += len(line)
+            if size >= self.min_chunk_size and zlib.crc32(line) < threshold * len(line):
+                yield b''.join(buffer)
+                buffer, size = [], 0
+
+        if buffer:
+            yield b''.join(buffer)
@@ -0,0 +1,112 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_METRICS_CACHE_DB = 'metrics-cache.db'
+
+
+def parser_key(parser):
+    """
+    :return: the key of the parser in the cache: its class and version (see ExecutionResultParser.version)
+    """
+    clazz = type(parser)
+    return '{0}.{1}:{2}'.format(clazz.__module__, clazz.__qualname__, getattr(parser, 'version', None))
+
+
+def logs_hash(logs):
+    """
+    :return: the sha256 of the logs (a string, bytes, a LogRef or an object with a chunks() method, e.g. SpilledLogs),
+    or None if the logs are of another type (their metrics are not cached)
+    """
+    if hasattr(logs, 'sha256'):
+        return logs.sha256
+    if isinstance(logs, str):
+        return hashlib.sha256(logs.encode('utf-8')).hexdigest()
+    if isinstance(logs, (bytes, bytearray)):
+        return hashlib.sha256(logs).hexdigest()
+    if not hasattr(logs, 'chunks'):
+        return None
+
+    digest = hashlib.sha256()
+    for chunk in logs.chunks():
+        digest.update(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    return digest.hexdigest()
+
+
+def parse_logs(parser, tool, workload, logs):
+    # executed in the worker processes by BenchmarkingController.reparse_results()
+    return parser.get_metrics(tool, workload, logs)
+
+
+class MetricsCache:
+    """
+    The metrics extracted by the parsers, stored in a SQLite database and keyed by the parser (class and version), the
+    tool, the workload and the hash of the logs. Changing the version of a parser invalidates all its entries
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.__db = None
+        self.__lock = threading.Lock()
+
+    def __connect(self):
+        if not self.__db:
+            self.__db = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.__db.execute('CREATE TABLE IF NOT EXISTS metrics ('
+                              'parser TEXT, tool TEXT, workload TEXT, logs_hash TEXT, metrics TEXT, '
+                              'PRIMARY KEY (parser, tool, workload, logs_hash))')
+            self.__db.commit()
+        return self.__db
+
+    def get(self, parser, tool, workload, logs_hash):
+        """
+        :return: the cached metrics or None
+        """
+        with self.__lock:
+            row = self.__connect().execute(
+                'SELECT metrics FROM metrics WHERE parser = ? AND tool = ? AND workload = ? AND logs_hash = ?',
+                (parser_key(parser), tool, workload, logs_hash)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, parser, tool, workload, logs_hash, metrics):
+        try:
+            data = json.dumps(metrics)
+        except (TypeError, ValueError) as ex:
+            logger.warning('Metrics of %s/%s not cached: %s', tool, workload, str(ex))
+            return
+
+        with self.__lock:
+            db = self.__connect()
+            with db:
+                db.execute('INSERT OR REPLACE INTO metrics (parser, tool, workload, logs_hash, metrics) '
+                           'VALUES (?, ?, ?, ?, ?)', (parser_key(parser), tool, workload, logs_hash, data))
+
+    def close(self):
+        with self.__lock:
+            if self.__db:
+                self.__db.close()
+                self.__db = None
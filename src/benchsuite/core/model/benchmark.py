@@ -19,9 +19,10 @@
 
 import configparser
 import os
-import sys
 from abc import abstractmethod
 
+from benchsuite.core import registry
+from benchsuite.core.configcache import read_config_file
 from benchsuite.core.configreader import BenchsuiteConfigParser
 from benchsuite.core.model.exception import ControllerConfigurationException
 
@@ -31,6 +32,22 @@ class Benchmark:
     A Benchmark
     """
 
+    # optional coroutine versions of prepare(), execute() and cleanup() used by the AsyncBenchmarkingController.
+    # Implementations that can run the phases without blocking override them with "async def" methods that have the
+    # same signature of the blocking ones. If None, the blocking methods are executed in a thread pool
+    prepare_async = None
+    execute_async = None
+    cleanup_async = None
+
+    # optional alternative to get_result(): a method (execution) that returns an iterable of chunks (str or bytes) of
+    # the logs, for benchmarks that produce large outputs. The logs are parsed while streamed, if the parser supports
+    # it (see ExecutionResultParser.new_incremental_parser), and written in a file when too large (see SpilledLogs)
+    get_result_stream = None
+
+    # True if cleanup() does not undo what prepare() installs on the execution environment: only then the prepare can
+    # be skipped on the environments already prepared for the tool (see get_prepare_script())
+    cleanup_keeps_prepare = False
+
     def __init__(self, tool_id, workload_id, tool_name, workload_name,
                  workload_categories,
                  workload_description):
@@ -66,24 +83,38 @@ class Benchmark:
     def get_result(self, execution):
         pass
 
+    def get_prepare_script(self):
+        """
+        returns the script executed by prepare() (or any string that identifies what it installs). If not None, the
+        prepare is skipped on the execution environments where the same script has already been executed for the same
+        tool and not undone by a cleanup() since (the benchmarks whose cleanup() leaves the prepared state in place
+        must set cleanup_keeps_prepare, otherwise each cleanup() is assumed to undo the prepare)
+        """
+        return None
+
     @abstractmethod
     def get_runtime(self, execution, phase):
         pass
 
 
-def load_benchmark_from_config_file(config_file, tool, workload):
-    if not os.path.isfile(config_file):
-        raise ControllerConfigurationException('Config file {0} does not exist'.format(config_file))
+class BenchmarkTemplate:
+    """
+    The parsed configuration file of a benchmark tool. It creates the Benchmark objects for the workloads of the tool
+    parsing the file and importing the benchmark class only once
+    """
 
-    config = BenchsuiteConfigParser()
-    config.read(config_file)
+    def __init__(self, config_file):
+        if not os.path.isfile(config_file):
+            raise ControllerConfigurationException('Config file {0} does not exist'.format(config_file))
 
-    provider_class = config['DEFAULT']['class']
+        self.config_file = config_file
+        self.config = read_config_file(config_file, BenchsuiteConfigParser, try_json=False)
 
-    module_name, class_name = provider_class.rsplit('.', 1)
+        self.clazz = registry.benchmarks.resolve(self.config['DEFAULT']['class'])
 
-    __import__(module_name)
-    module = sys.modules[module_name]
-    clazz = getattr(module, class_name)
+    def new_benchmark(self, tool, workload):
+        return self.clazz.load_from_config_file(self.config, tool, workload)
 
-    return clazz.load_from_config_file(config, tool, workload)
\ No newline at end of file
+
+def load_benchmark_from_config_file(config_file, tool, workload):
+    return BenchmarkTemplate(config_file).new_benchmark(tool, workload)
\ No newline at end of file
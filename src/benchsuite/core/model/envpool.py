@@ -0,0 +1,156 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import logging
+import threading
+import time
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_ENV_POOL_TTL = 600
+
+
+class EnvironmentPool:
+    """
+    Keeps the execution environments provisioned by the provider of a session, so that an environment released by an
+    execution can be handed to the next execution with a compatible request (see
+    ExecutionEnvironmentRequest.get_pool_key()) instead of provisioning a new one.
+
+    Each environment is used by one execution at a time. At most max_warm idle environments are kept and the ones
+    idle for more than ttl seconds are evicted. Evicted environments are passed to the release_execution_environment()
+    method of the provider, if implemented, otherwise they are destroyed with the provider (at the end of the session).
+
+    The provider is called holding provider_lock, if given (see BenchmarkingSession.provider_lock())
+    """
+
+    def __init__(self, provider, max_warm=1, ttl=DEFAULT_ENV_POOL_TTL, provider_lock=None):
+        self.provider = provider
+        self.provider_lock = provider_lock or nullcontext()
+        self.max_warm = max_warm
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__idle = []
+        self.__in_use = {}
+        self.__lock = threading.Lock()
+
+    def take(self, request):
+        """
+        :return: an idle environment compatible with the request (that is now in use) or None
+        """
+        key = request.get_pool_key()
+        evicted = []
+        env = None
+        with self.__lock:
+            self.__expire(evicted)
+            for i, (k, e, _) in enumerate(self.__idle):
+                if k == key:
+                    del self.__idle[i]
+                    self.__in_use[id(e)] = (key, e)
+                    env = e
+                    break
+            if env:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        self.__evict(evicted)
+        if env:
+            logger.debug('Reusing execution environment %s', env)
+        return env
+
+    def add(self, request, env):
+        """
+        Adds an environment just provisioned for the request (it is in use)
+        """
+        with self.__lock:
+            self.__in_use[id(env)] = (request.get_pool_key(), env)
+
+    def acquire(self, request):
+        """
+        :return: an idle environment compatible with the request or a new one provisioned by the provider
+        """
+        env = self.take(request)
+        if not env:
+            with self.provider_lock:
+                env = self.provider.get_execution_environment(request)
+            self.add(request, env)
+        return env
+
+    def release(self, env):
+        """
+        Returns the environment to the pool, when the execution that was using it is completed
+        """
+        evicted = []
+        with self.__lock:
+            entry = self.__in_use.pop(id(env), None)
+            if not entry:
+                return
+            self.__idle.append((entry[0], env, time.monotonic()))
+            self.__expire(evicted)
+            # the least recently used are evicted first
+            while len(self.__idle) > self.max_warm:
+                evicted.append(self.__idle.pop(0)[1])
+
+        self.__evict(evicted)
+
+    def discard(self, env):
+        """
+        Removes the environment from the pool (e.g. because the execution that was using it failed)
+        """
+        with self.__lock:
+            entry = self.__in_use.pop(id(env), None)
+        if entry:
+            self.__evict([env])
+
+    def close(self):
+        """
+        Evicts all the idle environments. The ones in use are evicted when released
+        """
+        with self.__lock:
+            evicted = [e for _, e, _ in self.__idle]
+            self.__idle = []
+            self.max_warm = 0
+        self.__evict(evicted)
+        logger.debug('Execution environments pool closed (%d reused, %d provisioned)', self.hits, self.misses)
+
+    def __len__(self):
+        return len(self.__idle) + len(self.__in_use)
+
+    def __expire(self, evicted):
+        if self.ttl is None:
+            return
+        now = time.monotonic()
+        expired = [entry for entry in self.__idle if now - entry[2] > self.ttl]
+        for entry in expired:
+            self.__idle.remove(entry)
+            evicted.append(entry[1])
+
+    def __evict(self, environments):
+        for env in environments:
+            logger.debug('Evicting execution environment %s', env)
+            if not self.provider.release_execution_environment:
+                continue
+            try:
+                with self.provider_lock:
+                    self.provider.release_execution_environment(env)
+            except Exception as ex:
+                logger.error('Error releasing the execution environment {0}: {1}'.format(env, str(ex)))
@@ -17,19 +17,29 @@
 # Developed in the ARTIST EU project (www.artist-project.eu) and in the
 # CloudPerfect EU project (https://cloudperfect.eu/)
 
+import codecs
+import copy
+import hashlib
 import time
 import uuid
 from abc import ABC, abstractmethod
 
 import logging
 
+from benchsuite.core import tracing
+from benchsuite.core.metricscache import logs_hash
 from benchsuite.core.model.exception import ParsingException
+from benchsuite.core.model.logs import LogsCollector, SpilledLogs, DEFAULT_SPILL_THRESHOLD
 
 logger = logging.getLogger(__name__)
 
 
 class ExecutionResultParser(ABC):
 
+    # the version of the parser. Increase it when the parsing changes, to invalidate the metrics cached for the
+    # previous version (see MetricsCache)
+    version = 0
+
     @abstractmethod
     def get_metrics(self, tool, workload, logs):
         """
@@ -39,6 +49,28 @@ class ExecutionResultParser(ABC):
         """
         pass
 
+    # optional method (tool, workload) -> IncrementalResultParser. If available, it is used to parse the logs of the
+    # benchmarks that stream them (see Benchmark.get_result_stream) without keeping them in memory
+    new_incremental_parser = None
+
+
+class IncrementalResultParser(ABC):
+    """
+    Parses the logs of one execution chunk by chunk. Implementations should keep only a bounded state (e.g. the
+    metrics found so far and the last incomplete line)
+    """
+
+    @abstractmethod
+    def feed(self, chunk):
+        pass
+
+    @abstractmethod
+    def close(self):
+        """
+        :return: the metrics extracted from all the chunks fed
+        """
+        pass
+
 
 class ExecutionResult:
 
@@ -82,10 +114,15 @@ class ExecutionCommandInfo:
     def __init__(self):
         self.started = None
         self.duration = None
+        self.skipped = False
 
 
 class BenchmarkExecution:
 
+    # the last result returned by get_execution_result(), without the logs, kept (and stored with the session) to
+    # analyse the executions without fetching their logs again (see analysis.ResultsTable.load())
+    last_result = None
+
     def __init__(self, benchmark, session):
         self.test = benchmark
         self.session = session
@@ -94,32 +131,166 @@ class BenchmarkExecution:
         self.exec_env = None
         self.last_run_info = None
 
-    def prepare(self) -> ExecutionCommandInfo:
+    def prepare(self, force=False) -> ExecutionCommandInfo:
+        """
+        :param force: execute the prepare even if the environment has already been prepared for the same tool (see
+        Benchmark.get_prepare_script())
+        """
+        self.__discard_execution_environment()
         env_request = self.test.get_env_request()
-        self.exec_env = self.session.get_execution_environment(env_request)
+        with tracing.span('acquire_environment'):
+            self.exec_env = self.session.get_execution_environment(env_request)
         logger.info('Using execution environment %s', str(self.exec_env))
         ret = ExecutionCommandInfo()
         ret.started = time.time()
-        self.test.prepare(self)
-        ret.duration = time.time() - ret.started
+        t0 = time.perf_counter()
+        fingerprint = self.__prepare_fingerprint()
+        with tracing.span('benchmark.prepare') as span:
+            if self.__is_prepared(fingerprint, force):
+                ret.skipped = True
+            else:
+                self.test.prepare(self)
+                self.__set_prepared(fingerprint)
+            span.set_attribute('skipped', ret.skipped)
+        ret.duration = time.perf_counter() - t0
         return ret
 
     def execute(self, _async=False) -> ExecutionCommandInfo:
         ret = ExecutionCommandInfo()
         ret.started = time.time()
-        self.test.execute(self, _async=_async)
-        ret.duration = time.time() - ret.started
+        t0 = time.perf_counter()
+        with tracing.span('benchmark.execute'):
+            self.test.execute(self, _async=_async)
+        ret.duration = time.perf_counter() - t0
         self.last_run_info = ret
         return ret
 
     def cleanup(self) -> ExecutionCommandInfo:
         ret = ExecutionCommandInfo()
         ret.started = time.time()
-        self.test.cleanup(self)
-        ret.duration = time.time() - ret.started
+        t0 = time.perf_counter()
+        with tracing.span('benchmark.cleanup'):
+            try:
+                self.test.cleanup(self)
+            except BaseException:
+                self.__clear_prepared()
+                raise
+        if not self.test.cleanup_keeps_prepare:
+            self.__clear_prepared()
+        ret.duration = time.perf_counter() - t0
+        self.session.release_execution_environment(self.exec_env)
+        return ret
+
+    #
+    # Coroutine versions of prepare(), execute() and cleanup(). They use the async hooks of the benchmark and of the
+    # provider when available, otherwise the blocking methods are executed with run_sync (a coroutine function that
+    # runs a blocking callable in a thread pool)
+    #
+
+    async def prepare_async(self, run_sync, force=False) -> ExecutionCommandInfo:
+        # see __discard_execution_environment()
+        if self.exec_env is not None:
+            await self.session.discard_execution_environment_async(self.exec_env, run_sync)
+        env_request = self.test.get_env_request()
+        with tracing.span('acquire_environment'):
+            self.exec_env = await self.session.get_execution_environment_async(env_request, run_sync)
+        logger.info('Using execution environment %s', str(self.exec_env))
+        ret = ExecutionCommandInfo()
+        ret.started = time.time()
+        t0 = time.perf_counter()
+        fingerprint = self.__prepare_fingerprint()
+        with tracing.span('benchmark.prepare') as span:
+            if self.__is_prepared(fingerprint, force):
+                ret.skipped = True
+            else:
+                if self.test.prepare_async:
+                    await self.test.prepare_async(self)
+                else:
+                    await run_sync(self.test.prepare, self)
+                self.__set_prepared(fingerprint)
+            span.set_attribute('skipped', ret.skipped)
+        ret.duration = time.perf_counter() - t0
         return ret
 
-    def get_execution_result(self) -> ExecutionResult:
+    #
+    # Prepare fingerprints: (tool, hash of the prepare script, environment id) of the prepares executed on an
+    # environment, recorded in its prepare_fingerprints. The ones of the tool are removed by the cleanup, unless the
+    # benchmark declares that it does not undo the prepare (see Benchmark.cleanup_keeps_prepare) and it does not fail
+    #
+
+    def __prepare_fingerprint(self):
+        script = self.test.get_prepare_script()
+        if script is None:
+            return None
+        try:
+            env_id = self.exec_env.get_specs_dict().get('id')
+        except Exception:
+            env_id = None
+        return self.test.tool_id, hashlib.sha256(script.encode('utf-8')).hexdigest(), str(env_id)
+
+    def __is_prepared(self, fingerprint, force):
+        if force or not fingerprint or fingerprint not in (self.exec_env.prepare_fingerprints or ()):
+            return False
+        logger.info('Execution environment %s already prepared for %s. Skipping the prepare', self.exec_env,
+                    self.test.tool_id)
+        return True
+
+    def __set_prepared(self, fingerprint):
+        if not fingerprint:
+            return
+        if self.exec_env.prepare_fingerprints is None:
+            self.exec_env.prepare_fingerprints = set()
+        self.exec_env.prepare_fingerprints.add(fingerprint)
+
+    def __clear_prepared(self):
+        if self.exec_env is not None and self.exec_env.prepare_fingerprints:
+            self.exec_env.prepare_fingerprints = {f for f in self.exec_env.prepare_fingerprints
+                                                  if f[0] != self.test.tool_id}
+
+    async def execute_async(self, run_sync, _async=False) -> ExecutionCommandInfo:
+        ret = ExecutionCommandInfo()
+        ret.started = time.time()
+        t0 = time.perf_counter()
+        with tracing.span('benchmark.execute'):
+            if self.test.execute_async:
+                await self.test.execute_async(self, _async=_async)
+            else:
+                await run_sync(self.test.execute, self, _async=_async)
+        ret.duration = time.perf_counter() - t0
+        self.last_run_info = ret
+        return ret
+
+    async def cleanup_async(self, run_sync) -> ExecutionCommandInfo:
+        ret = ExecutionCommandInfo()
+        ret.started = time.time()
+        t0 = time.perf_counter()
+        with tracing.span('benchmark.cleanup'):
+            try:
+                if self.test.cleanup_async:
+                    await self.test.cleanup_async(self)
+                else:
+                    await run_sync(self.test.cleanup, self)
+            except BaseException:
+                self.__clear_prepared()
+                raise
+        if not self.test.cleanup_keeps_prepare:
+            self.__clear_prepared()
+        ret.duration = time.perf_counter() - t0
+        await self.session.release_execution_environment_async(self.exec_env, run_sync)
+        return ret
+
+    def __discard_execution_environment(self):
+        # prepared again (e.g. retrying after a failure): the environment used before might be in a bad state
+        if self.exec_env is not None:
+            self.session.discard_execution_environment(self.exec_env)
+
+    def get_execution_result(self, spill_folder=None, spill_threshold=DEFAULT_SPILL_THRESHOLD,
+                             metrics_cache=None) -> ExecutionResult:
+        """
+        :param spill_folder: where the logs streamed by the benchmark are written if larger than spill_threshold
+        characters (see LogsCollector)
+        :param metrics_cache: if set, the metrics are taken from the cache if the same logs have already been parsed
+        """
         if not self.last_run_info:
             return None
 
@@ -133,19 +304,82 @@ class BenchmarkExecution:
         e.provider = self.session.provider.get_provider_properties_dict()
         e.exec_id = self.id
         e.exec_env = self.exec_env.get_specs_dict()
-        e.logs = self.test.get_result(self)
         e.properties.update(self.session.props)
         e.metrics = {'duration': {'value': e.duration, 'unit': 's'}}
+
+        incremental_parser = None
+        if self.test.get_result_stream and self.test.parser and self.test.parser.new_incremental_parser:
+            incremental_parser = self.test.parser.new_incremental_parser(e.tool, e.workload)
+
+        with tracing.span('fetch_result', streamed=bool(self.test.get_result_stream)):
+            if self.test.get_result_stream:
+                e.logs, parsing_error = self.__collect_result_stream(incremental_parser, spill_folder,
+                                                                     spill_threshold)
+            else:
+                e.logs, parsing_error = self.test.get_result(self), None
+
         if self.test.parser:
             try:
-                e.metrics.update(self.test.parser.get_metrics(e.tool, e.workload, e.logs))
+                if parsing_error:
+                    raise parsing_error
+                with tracing.span('parse'):
+                    if incremental_parser:
+                        e.metrics.update(incremental_parser.close())
+                    else:
+                        e.metrics.update(self.__parse(e, metrics_cache))
             except Exception as ex:
                 logger.error('Error parsing execution results: {0}'.format(str(ex)))
                 pe = ParsingException('Error parsing execution results: {0}'.format(str(ex)))
                 pe.logs = e.logs
                 raise pe from ex
+
+        self.last_result = copy.copy(e)
+        self.last_result.logs = None
         return e
 
+    def __parse(self, result, metrics_cache):
+        # the parsers receive the logs as a string: the spilled ones are loaded only for them (and not if the metrics
+        # are in the cache, because their hash is computed reading the file in chunks)
+        parser = self.test.parser
+        if not metrics_cache:
+            return parser.get_metrics(result.tool, result.workload, self.__logs_string(result.logs))
+
+        h = logs_hash(result.logs)
+        if h is None:
+            return parser.get_metrics(result.tool, result.workload, self.__logs_string(result.logs))
+
+        metrics = metrics_cache.get(parser, result.tool, result.workload, h)
+        if metrics is None:
+            metrics = parser.get_metrics(result.tool, result.workload, self.__logs_string(result.logs))
+            metrics_cache.put(parser, result.tool, result.workload, h, metrics)
+        else:
+            logger.debug('Metrics of execution %s found in the cache', self.id)
+        return metrics
+
+    @staticmethod
+    def __logs_string(logs):
+        return logs.read() if isinstance(logs, SpilledLogs) else logs
+
+    def __collect_result_stream(self, incremental_parser, spill_folder, spill_threshold):
+        collector = LogsCollector(spill_threshold, spill_folder, prefix='{0}-'.format(self.id))
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        parsing_error = None
+        try:
+            for chunk in self.test.get_result_stream(self):
+                if isinstance(chunk, bytes):
+                    chunk = decoder.decode(chunk)
+                collector.write(chunk)
+                if incremental_parser and not parsing_error:
+                    try:
+                        incremental_parser.feed(chunk)
+                    except Exception as ex:
+                        # the logs are collected anyway, to be stored with the error
+                        parsing_error = ex
+        except Exception:
+            collector.discard()
+            raise
+        return collector.close(), parsing_error
+
     def collect_result(self):
         return self.test.get_result(self)
 
@@ -158,6 +392,9 @@ class BenchmarkExecution:
 
 class ExecutionEnvironment(ABC):
 
+    # the prepares already executed on the environment (see BenchmarkExecution.prepare())
+    prepare_fingerprints = None
+
     def __init__(self):
         pass
 
@@ -174,4 +411,13 @@ class ExecutionEnvironmentRequest:
     def __init__(self):
         pass
 
+    def get_pool_key(self):
+        """
+        returns a hashable key of the request, used by the EnvironmentPool: the environments provisioned for a request
+        are reused only for requests with the same key. By default, requests are compatible if they have the same
+        class and attributes
+        """
+        return type(self).__module__, type(self).__qualname__, \
+            tuple(sorted((k, repr(v)) for k, v in vars(self).items()))
+
 
@@ -0,0 +1,125 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import io
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_SPILL_THRESHOLD = 1024 * 1024
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class SpilledLogs:
+    """
+    The logs of an execution that have been written in a file because they were too large to be kept in memory.
+
+    The file exists only on the host of the controller: before the result is saved, the BenchmarkingController stores
+    the logs in the log store or loads them, and removes the file
+    """
+
+    def __init__(self, file, size):
+        self.file = file
+        self.size = size
+
+    def open(self):
+        return open(self.file, encoding='utf-8', errors='replace')
+
+    def read(self):
+        """
+        :return: the whole logs (loaded in memory)
+        """
+        with self.open() as f:
+            return f.read()
+
+    def chunks(self, chunk_size=READ_CHUNK_SIZE):
+        with self.open() as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def remove(self):
+        os.remove(self.file)
+
+    def __json__(self):
+        return {'file': self.file, 'size': self.size}
+
+    def __str__(self) -> str:
+        return '<logs in {0} ({1} bytes)>'.format(self.file, self.size)
+
+
+class LogsCollector:
+    """
+    Collects the chunks of the logs in memory until their size exceeds spill_threshold. Then all the logs are written
+    in a file in spill_folder (or in the temporary folder if not set)
+    """
+
+    def __init__(self, spill_threshold=DEFAULT_SPILL_THRESHOLD, spill_folder=None, prefix='logs-'):
+        self.spill_threshold = spill_threshold
+        self.spill_folder = spill_folder
+        self.prefix = prefix
+        self.size = 0
+        self.__buffer = io.StringIO()
+        self.__file = None
+        self.__file_name = None
+
+    def write(self, chunk):
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode('utf-8', 'replace')
+
+        self.size += len(chunk)
+        if self.__file:
+            self.__file.write(chunk)
+            return
+
+        self.__buffer.write(chunk)
+        if self.size > self.spill_threshold:
+            self.__spill()
+
+    def close(self):
+        """
+        :return: the logs as string or, if they have been spilled, a SpilledLogs object
+        """
+        if not self.__file:
+            return self.__buffer.getvalue()
+
+        self.__file.close()
+        self.__file = None
+        return SpilledLogs(self.__file_name, os.path.getsize(self.__file_name))
+
+    def discard(self):
+        if self.__file:
+            self.__file.close()
+            self.__file = None
+            os.remove(self.__file_name)
+
+    def __spill(self):
+        if self.spill_folder:
+            os.makedirs(self.spill_folder, exist_ok=True)
+        fd, self.__file_name = tempfile.mkstemp(dir=self.spill_folder, prefix=self.prefix, suffix='.log')
+        self.__file = os.fdopen(fd, 'w', encoding='utf-8')
+        self.__file.write(self.__buffer.getvalue())
+        self.__buffer = None
+        logger.debug('Logs larger than %d characters: spilling them to %s', self.spill_threshold, self.__file_name)
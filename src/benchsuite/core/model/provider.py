@@ -20,15 +20,27 @@
 import configparser
 import json
 import os
-import sys
 import uuid
 from abc import ABC, abstractmethod
 
+from benchsuite.core import registry
+from benchsuite.core.configcache import read_config_file
 from benchsuite.core.model.exception import ControllerConfigurationException
 from benchsuite.core.model.execution import ExecutionEnvironmentRequest, ExecutionEnvironment
 
 
 class ServiceProvider(ABC):
+    """
+    A service of a provider, where the execution environments of the benchmarks are provisioned.
+
+    The executions of a session can run in parallel (see BenchmarkingController.execute_onestep()): unless the provider
+    declares thread_safe, its get_execution_environment() and release_execution_environment() are never called
+    concurrently for the same session (see BenchmarkingSession.provider_lock())
+    """
+
+    # True if get_execution_environment() and release_execution_environment() can be called concurrently by more
+    # threads
+    thread_safe = False
 
     @abstractmethod
     def __init__(self, name, service_type):
@@ -40,6 +52,15 @@ class ServiceProvider(ABC):
     def get_execution_environment(self, request: ExecutionEnvironmentRequest) -> ExecutionEnvironment:
         pass
 
+    # optional coroutine version of get_execution_environment() used by the AsyncBenchmarkingController. If None, the
+    # blocking method is executed in a thread pool
+    get_execution_environment_async = None
+
+    # optional method (environment) that releases (e.g. destroys) one execution environment. It is used by the
+    # EnvironmentPool to evict the environments not needed anymore. If None, the environments are destroyed only by
+    # destroy_service()
+    release_execution_environment = None
+
     @abstractmethod
     def destroy_service(self):
         pass
@@ -58,13 +79,7 @@ def load_service_provider_from_config_file(config_file, service_type=None) -> Se
     if not os.path.isfile(config_file):
         raise ControllerConfigurationException('Config file {0} does not exist'.format(config_file))
 
-    try:
-        with open(config_file) as f:
-            config = configparser.ConfigParser()
-            config.read_dict(json.load(f))
-    except ValueError as ex:
-        config = configparser.ConfigParser()
-        config.read(config_file)
+    config = read_config_file(config_file)
 
     return load_provider_from_config(config, service_type)
 
@@ -82,13 +97,7 @@ def load_provider_from_config_string(config_string, service_type=None):
 
 
 def load_provider_from_config(config, service_type=None):
-    provider_class = config['provider']['class']
-
-    module_name, class_name = provider_class.rsplit('.', 1)
-
-    __import__(module_name)
-    module = sys.modules[module_name]
-    clazz = getattr(module, class_name)
+    clazz = registry.providers.resolve(config['provider']['class'])
 
 
     if not service_type:
@@ -17,17 +17,30 @@
 # Developed in the ARTIST EU project (www.artist-project.eu) and in the
 # CloudPerfect EU project (https://cloudperfect.eu/)
 
-
-
+import threading
 import time
 import uuid
+from contextlib import nullcontext
 
 from benchsuite.core.model.execution import BenchmarkExecution
 from benchsuite.core.model.provider import ServiceProvider
 
 
+# guards the creation of the provider locks of the sessions
+_provider_lock_guard = threading.Lock()
+
+
 class BenchmarkingSession:
 
+    # index (exec_id -> session) of the SessionStorageManager the session belongs to. It is not persisted
+    execution_index = None
+
+    # the pool of the execution environments of the session (see EnvironmentPool), if enabled. It is not persisted
+    env_pool = None
+
+    # see provider_lock(). It is not persisted
+    __provider_lock = None
+
     def __init__(self, provider: ServiceProvider):
         self.provider = provider
         self.id = str(uuid.uuid4())
@@ -48,6 +61,8 @@ class BenchmarkingSession:
     def new_execution(self, benchmark):
         e = BenchmarkExecution(benchmark, self)
         self.executions[e.id] = e
+        if self.execution_index is not None:
+            self.execution_index[e.id] = self
         return e
 
     def list_executions(self):
@@ -56,8 +71,71 @@ class BenchmarkingSession:
     def get_execution(self, exec_id):
         return self.executions[exec_id]
 
+    def provider_lock(self):
+        """
+        :return: the lock held while calling the provider to get or release the execution environments, so that the
+        parallel executions of the session do not call it concurrently (a no-op one if the provider is thread safe,
+        see ServiceProvider.thread_safe)
+        """
+        if self.provider.thread_safe:
+            return nullcontext()
+        if self.__provider_lock is None:
+            with _provider_lock_guard:
+                if self.__provider_lock is None:
+                    self.__provider_lock = threading.RLock()
+        return self.__provider_lock
+
     def get_execution_environment(self, request):
-        return self.provider.get_execution_environment(request)
+        if self.env_pool is not None:
+            return self.env_pool.acquire(request)
+
+        with self.provider_lock():
+            return self.provider.get_execution_environment(request)
+
+    async def get_execution_environment_async(self, request, run_sync):
+        # the pool operations are executed with run_sync because they can release (e.g. destroy) the evicted
+        # environments with the blocking release_execution_environment() of the provider
+        env = await run_sync(self.env_pool.take, request) if self.env_pool is not None else None
+        if env:
+            return env
+
+        if self.provider.get_execution_environment_async:
+            env = await self.provider.get_execution_environment_async(request)
+        else:
+            env = await run_sync(self.__get_provider_environment, request)
+
+        if self.env_pool is not None:
+            self.env_pool.add(request, env)
+        return env
+
+    def __get_provider_environment(self, request):
+        with self.provider_lock():
+            return self.provider.get_execution_environment(request)
+
+    def release_execution_environment(self, env):
+        if self.env_pool is not None:
+            self.env_pool.release(env)
+
+    async def release_execution_environment_async(self, env, run_sync):
+        if self.env_pool is not None:
+            await run_sync(self.env_pool.release, env)
+
+    def discard_execution_environment(self, env):
+        if self.env_pool is not None:
+            self.env_pool.discard(env)
+
+    async def discard_execution_environment_async(self, env, run_sync):
+        if self.env_pool is not None:
+            await run_sync(self.env_pool.discard, env)
 
     def destroy(self):
-        self.provider.destroy_service()
\ No newline at end of file
+        if self.env_pool is not None:
+            self.env_pool.close()
+        self.provider.destroy_service()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('execution_index', None)
+        state.pop('env_pool', None)
+        state.pop('_BenchmarkingSession__provider_lock', None)
+        return state
\ No newline at end of file
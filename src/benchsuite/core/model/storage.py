@@ -16,15 +16,19 @@
 #
 # Developed in the ARTIST EU project (www.artist-project.eu) and in the
 # CloudPerfect EU project (https://cloudperfect.eu/)
+import bisect
 import configparser
+import datetime
 import json
 import os
+import threading
 from abc import ABC, abstractmethod
 
-import sys
-
 import logging
 
+from benchsuite.core import registry
+from benchsuite.core.config import get_data_folder
+from benchsuite.core.configcache import read_config_file
 from benchsuite.core.model.exception import ControllerConfigurationException
 from benchsuite.core.model.execution import ExecutionError
 
@@ -41,20 +45,296 @@ class StorageConnector(ABC):
         """
         pass
 
+    def save_execution_results(self, execution_results):
+        """
+        saves many execution results on the storage backend. The default implementation saves them one by one:
+        connectors that can save them with a single operation should override it
+        :param execution_results: an iterable of execution results
+        """
+        for r in execution_results:
+            self.save_execution_result(r)
+
     @abstractmethod
     def save_execution_error(self, execution_error: ExecutionError):
         """saves the execution error"""
         pass
 
+    # optional coroutine versions of save_execution_result() and save_execution_error() used by the
+    # AsyncBenchmarkingController. If None, the blocking methods are executed in a thread pool
+    save_execution_result_async = None
+    save_execution_error_async = None
+
     @staticmethod
     @abstractmethod
     def load_from_config(config):
         pass
 
+
+def _json_default(obj):
+    if hasattr(obj, '__json__'):
+        return obj.__json__()
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8', 'replace')
+    if hasattr(obj, '__dict__'):
+        return obj.__dict__
+    return str(obj)
+
+
+def _record_time(record):
+    t = getattr(record, 'start', None) or getattr(record, 'timestamp', None)
+    if isinstance(t, datetime.datetime):
+        return t.timestamp()
+    return float(t) if t else 0.0
+
+
+def _index_field(value):
+    return str(value or '').replace('\t', ' ').replace('\n', ' ')
+
+
+class _IndexEntry:
+
+    __slots__ = ['kind', 'segment', 'offset', 'length', 'time', 'tool', 'workload', 'provider']
+
+    def __init__(self, kind, segment, offset, length, time, tool, workload, provider):
+        self.kind = kind
+        self.segment = segment
+        self.offset = offset
+        self.length = length
+        self.time = time
+        self.tool = tool
+        self.workload = workload
+        self.provider = provider
+
+    def to_line(self):
+        return '{0}\t{1}\t{2}\t{3}\t{4!r}\t{5}\t{6}\t{7}\n'.format(
+            self.kind, self.segment, self.offset, self.length, self.time, self.tool, self.workload, self.provider)
+
+    @staticmethod
+    def from_line(line):
+        kind, segment, offset, length, time, tool, workload, provider = line.rstrip('\n').split('\t')
+        return _IndexEntry(kind, int(segment), int(offset), int(length), float(time), tool, workload, provider)
+
+
+class _KindIndex:
+    """
+    The index entries of one kind of records: in the order they have been saved, sorted by time (to select the time
+    ranges with bisect) and grouped by tool, workload and provider
+    """
+
+    FIELDS = ('tool', 'workload', 'provider')
+
+    def __init__(self):
+        self.entries = []
+        # the times of the entries, sorted, and the positions of the entries (in self.entries) with those times
+        self.times = []
+        self.positions = []
+        self.by_field = {f: {} for f in self.FIELDS}
+
+    def add(self, entry):
+        position = len(self.entries)
+        self.entries.append(entry)
+        # the records are usually saved in time order: appended at the end
+        i = bisect.bisect_right(self.times, entry.time)
+        self.times.insert(i, entry.time)
+        self.positions.insert(i, position)
+        for field, positions in self.by_field.items():
+            positions.setdefault(getattr(entry, field), []).append(position)
+
+    def select(self, start=None, end=None, **filters):
+        """
+        :return: the entries that match all the filters, in the order they have been saved
+        """
+        # the smallest set of candidates found with the indexes, checked then against all the filters
+        if start is None and end is None:
+            candidates = range(len(self.entries))
+        else:
+            lo = 0 if start is None else bisect.bisect_left(self.times, start)
+            hi = len(self.times) if end is None else bisect.bisect_left(self.times, end)
+            candidates = self.positions[lo:hi]
+
+        filters = {f: v for f, v in filters.items() if v is not None}
+        for field, value in filters.items():
+            positions = self.by_field[field].get(value, ())
+            if len(positions) < len(candidates):
+                candidates = positions
+
+        selected = [p for p in candidates
+                    if all(getattr(self.entries[p], f) == v for f, v in filters.items()) and
+                    (start is None or self.entries[p].time >= start) and
+                    (end is None or self.entries[p].time < end)]
+        return [self.entries[p] for p in sorted(selected)]
+
+
 class SimpleFileBackend(StorageConnector):
+    """
+    Stores the results and the errors in local files, without any external dependency.
+
+    The records are appended as json lines to segment files (results-NNNNNN.ndjson and errors-NNNNNN.ndjson) in the
+    storage folder and a new segment is started when the current one exceeds segment_size bytes. For each record, a
+    line with its position, tool, workload, provider name and time is appended to the index file (index.tsv). The
+    index is loaded in memory (sorted by time and grouped by tool, workload and provider), so that query() finds the
+    records without scanning all the index and reads from the segments only the records selected.
+
+    If the folder is not configured, the results are stored in the "results" folder in the data folder (see
+    config.get_data_folder()).
+
+    Configuration:
 
+        [Storage]
+        class = file
+        folder = /path/to/results
+        segment_size = 67108864
+    """
+
+    INDEX_FILE = 'index.tsv'
+    SEGMENT_FILE = '{0}-{1:06d}.ndjson'
+    DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+    __KINDS = {'result': 'results', 'error': 'errors'}
+
+    def __init__(self, folder, segment_size=DEFAULT_SEGMENT_SIZE):
+        self.folder = folder
+        self.segment_size = segment_size
+        self.__lock = threading.Lock()
+        self.__index = {kind: _KindIndex() for kind in self.__KINDS}
+        self.__segments = {}
+        self.__index_file = None
+
+        os.makedirs(folder, exist_ok=True)
+        self.__load_index()
+
+    def save_execution_result(self, execution_result):
+        self.save_execution_results([execution_result])
+
+    def save_execution_results(self, execution_results):
+        self.__append('result', execution_results)
+
+    def save_execution_error(self, execution_error: ExecutionError):
+        self.__append('error', [execution_error])
+
+    def query(self, kind='result', tool=None, workload=None, provider=None, start=None, end=None):
+        """
+        Reads the stored records that match all the filters given.
+        :param kind: 'result' or 'error'
+        :param start: the minimum time (epoch seconds) of the records (start of the execution for results, timestamp
+        for errors)
+        :param end: the maximum time (excluded)
+        :return: a generator of dictionaries, in the order they have been saved
+        """
+        with self.__lock:
+            for _, f in self.__segments.values():
+                f.flush()
+            entries = self.__index[kind].select(start, end, tool=tool, workload=workload, provider=provider)
+
+        segment_file = None
+        f = None
+        try:
+            for e in entries:
+                if e.segment != segment_file:
+                    if f:
+                        f.close()
+                    segment_file = e.segment
+                    f = open(self.__segment_path(kind, e.segment), 'rb')
+                f.seek(e.offset)
+                yield json.loads(f.read(e.length).decode('utf-8'))
+        finally:
+            if f:
+                f.close()
+
+    def close(self):
+        with self.__lock:
+            for _, f in self.__segments.values():
+                f.close()
+            self.__segments = {}
+            if self.__index_file:
+                self.__index_file.close()
+                self.__index_file = None
+
+    def __append(self, kind, records):
+        lines = []
+        for r in records:
+            data = json.dumps(r.__dict__, default=_json_default).encode('utf-8') + b'\n'
+            provider = r.provider.get('name') if isinstance(r.provider, dict) else r.provider
+            lines.append((data, _record_time(r), _index_field(r.tool), _index_field(r.workload),
+                          _index_field(provider)))
+
+        with self.__lock:
+            number, f = self.__current_segment(kind)
+            entries = []
+            for data, t, tool, workload, provider in lines:
+                if f.tell() >= self.segment_size:
+                    number, f = self.__open_segment(kind, number + 1)
+                entries.append(_IndexEntry(kind, number, f.tell(), len(data), t, tool, workload, provider))
+                f.write(data)
+            f.flush()
+
+            # the index is written after the data, so that it never references incomplete records
+            self.__index_file.write(''.join(e.to_line() for e in entries))
+            self.__index_file.flush()
+            for e in entries:
+                self.__index[kind].add(e)
+
+    def __current_segment(self, kind):
+        if kind not in self.__segments:
+            entries = self.__index[kind].entries
+            self.__open_segment(kind, entries[-1].segment if entries else 1)
+        return self.__segments[kind]
+
+    def __open_segment(self, kind, number):
+        if kind in self.__segments:
+            self.__segments[kind][1].close()
+            logger.debug('Starting %s segment %d in %s', kind, number, self.folder)
+        self.__segments[kind] = (number, open(self.__segment_path(kind, number), 'ab'))
+        return self.__segments[kind]
+
+    def __segment_path(self, kind, number):
+        return os.path.join(self.folder, self.SEGMENT_FILE.format(self.__KINDS[kind], number))
+
+    def __load_index(self):
+        index_path = os.path.join(self.folder, self.INDEX_FILE)
+        sizes = {}
+        loaded = []
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        # truncated by a crash while writing
+                        break
+                    e = _IndexEntry.from_line(line)
+                    key = (e.kind, e.segment)
+                    if key not in sizes:
+                        path = self.__segment_path(e.kind, e.segment)
+                        sizes[key] = os.path.getsize(path) if os.path.exists(path) else 0
+                    if e.offset + e.length <= sizes[key]:
+                        loaded.append(e)
+                        self.__index[e.kind].add(e)
+
+        # rewrite the index if the last line was truncated, so that the next entries are appended correctly
+        mode = 'a' if self.__index_is_clean(index_path) else 'w'
+        self.__index_file = open(index_path, mode)
+        if mode == 'w':
+            self.__index_file.write(''.join(e.to_line() for e in loaded))
+            self.__index_file.flush()
+
+        logger.debug('%d records in the index of %s', len(loaded), self.folder)
+
+    @staticmethod
+    def __index_is_clean(index_path):
+        if not os.path.exists(index_path) or os.path.getsize(index_path) == 0:
+            return True
+        with open(index_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    @staticmethod
     def load_from_config(config):
-        logger.debug('Loading %s', SimpleFileBackend.__module__ + "." + __class__.__name__)
+        logger.debug('Loading %s', SimpleFileBackend.__module__ + "." + SimpleFileBackend.__name__)
+        section = config['Storage']
+        folder = section.get('folder') or os.path.join(get_data_folder(), 'results')
+        return SimpleFileBackend(os.path.expanduser(folder),
+                                 section.getint('segment_size', SimpleFileBackend.DEFAULT_SEGMENT_SIZE))
 
 
 def load_storage_connector_from_config_string(config_string):
@@ -69,13 +349,7 @@ def load_storage_connector_from_config_string(config_string):
     return load_storage_connector_from_config(config)
 
 def load_storage_connector_from_config(config):
-    storage_class = config['Storage']['class']
-
-    module_name, class_name = storage_class.rsplit('.', 1)
-
-    __import__(module_name)
-    module = sys.modules[module_name]
-    clazz = getattr(module, class_name)
+    clazz = registry.storage_connectors.resolve(config['Storage']['class'])
 
     return clazz.load_from_config(config)
 
@@ -83,12 +357,6 @@ def load_storage_connector_from_config_file(config_file):
     if not os.path.isfile(config_file):
         raise ControllerConfigurationException('Config file {0} does not exist'.format(config_file))
 
-    try:
-        with open(config_file) as f:
-            config = configparser.ConfigParser()
-            config.read_dict(json.load(f))
-    except ValueError as ex:
-        config = configparser.ConfigParser()
-        config.read(config_file)
+    config = read_config_file(config_file)
 
     return load_storage_connector_from_config(config)
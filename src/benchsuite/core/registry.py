@@ -0,0 +1,129 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import importlib
+import logging
+import threading
+from typing import Dict
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:  # pragma: no cover (Python < 3.8)
+    importlib_metadata = None
+
+from benchsuite.core.model.exception import ControllerConfigurationException
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS_GROUP = 'benchsuite.providers'
+BENCHMARKS_GROUP = 'benchsuite.benchmarks'
+STORAGE_GROUP = 'benchsuite.storage'
+HOOKS_GROUP = 'benchsuite.hooks'
+
+
+def _entry_points(group):
+    if not importlib_metadata:
+        return []
+
+    eps = importlib_metadata.entry_points()
+    if hasattr(eps, 'select'):
+        return list(eps.select(group=group))
+    return list(eps.get(group, []))
+
+
+class PluginRegistry:
+    """
+    Resolves the classes that implement providers, benchmarks, storage connectors or lifecycle hooks.
+
+    In the configuration files, a class can be referenced by its dotted name (e.g. "mypackage.module.MyProvider") or
+    by the name of an entry point registered by a package in the registry group (e.g. "myprovider"). Classes are
+    imported only the first time they are resolved, validated and then memoized. The available implementations are
+    listed from the entry points metadata, without importing them.
+    """
+
+    def __init__(self, group, factory_method):
+        self.group = group
+        self.factory_method = factory_method
+        self.__classes = {}
+        self.__entry_points = None
+        self.__lock = threading.Lock()
+
+    def __get_entry_points(self):
+        if self.__entry_points is None:
+            self.__entry_points = {ep.name: ep for ep in _entry_points(self.group)}
+        return self.__entry_points
+
+    def list_available(self) -> Dict[str, str]:
+        """
+        :return: the implementations registered in the group (name -> "module:class"). Nothing is imported
+        """
+        return {name: ep.value for name, ep in self.__get_entry_points().items()}
+
+    def resolve(self, name):
+        clazz = self.__classes.get(name)
+        if clazz:
+            return clazz
+
+        with self.__lock:
+            if name not in self.__classes:
+                self.__classes[name] = self.__validate(name, self.__load(name))
+            return self.__classes[name]
+
+    def validate_all(self) -> Dict[str, str]:
+        """
+        Resolves all the implementations registered in the group.
+        :return: the errors found (name -> error message)
+        """
+        errors = {}
+        for name in self.__get_entry_points():
+            try:
+                self.resolve(name)
+            except Exception as ex:
+                errors[name] = '{0}: {1}'.format(type(ex).__name__, str(ex))
+        return errors
+
+    def __load(self, name):
+        if '.' not in name and ':' not in name:
+            ep = self.__get_entry_points().get(name)
+            if not ep:
+                raise ControllerConfigurationException(
+                    '"{0}" is not a class name and is not registered in {1}'.format(name, self.group))
+            logger.debug('Loading %s from entry point %s', ep.value, self.group)
+            return ep.load()
+
+        if ':' in name:
+            module_name, class_name = name.split(':', 1)
+        else:
+            module_name, class_name = name.rsplit('.', 1)
+
+        module = importlib.import_module(module_name)
+        return getattr(module, class_name)
+
+    def __validate(self, name, clazz):
+        if not isinstance(clazz, type) or not callable(getattr(clazz, self.factory_method, None)):
+            raise ControllerConfigurationException(
+                '{0} is not a valid implementation for {1}: method {2}() not found'.format(
+                    name, self.group, self.factory_method))
+        return clazz
+
+
+providers = PluginRegistry(PROVIDERS_GROUP, 'load_from_config_file')
+benchmarks = PluginRegistry(BENCHMARKS_GROUP, 'load_from_config_file')
+storage_connectors = PluginRegistry(STORAGE_GROUP, 'load_from_config')
+hooks = PluginRegistry(HOOKS_GROUP, 'load_from_config')
@@ -0,0 +1,166 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import logging
+import math
+import numbers
+
+logger = logging.getLogger(__name__)
+
+
+# two-sided critical values of the Student's t distribution for 1..30 degrees of freedom and of the normal
+# distribution (for infinite degrees of freedom)
+_T_TABLE = {
+    0.90: ([6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833, 1.812,
+            1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734, 1.729, 1.725,
+            1.721, 1.717, 1.714, 1.711, 1.708, 1.706, 1.703, 1.701, 1.699, 1.697], 1.645),
+    0.95: ([12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+            2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+            2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042], 1.960),
+    0.99: ([63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250, 3.169,
+            3.106, 3.055, 3.012, 2.977, 2.947, 2.921, 2.898, 2.878, 2.861, 2.845,
+            2.831, 2.819, 2.807, 2.797, 2.787, 2.779, 2.771, 2.763, 2.756, 2.750], 2.576),
+}
+
+STOP_MAX_RUNS = 'max_runs'
+STOP_MAX_TIME = 'max_time'
+STOP_CI_WIDTH = 'ci_width'
+
+
+def t_critical_value(confidence, df):
+    if confidence not in _T_TABLE:
+        raise ValueError('Confidence level {0} not supported (use one of {1})'.format(
+            confidence, ', '.join(map(str, sorted(_T_TABLE)))))
+
+    table, z = _T_TABLE[confidence]
+    if df <= len(table):
+        return table[df - 1]
+    # beyond the table, the difference from the normal value decreases approximately as 1/df
+    return z + (table[-1] - z) * len(table) / df
+
+
+def summarize(samples, confidence=0.95):
+    """
+    :return: the number of samples, mean, stddev (sample), min, max and the confidence interval of the mean
+    """
+    n = len(samples)
+    mean = math.fsum(samples) / n
+    stddev = math.sqrt(math.fsum((s - mean) ** 2 for s in samples) / (n - 1)) if n > 1 else math.nan
+    half_width = t_critical_value(confidence, n - 1) * stddev / math.sqrt(n) if n > 1 else math.nan
+    return {
+        'runs': n,
+        'mean': mean,
+        'stddev': stddev,
+        'min': min(samples),
+        'max': max(samples),
+        'ci_low': mean - half_width,
+        'ci_high': mean + half_width,
+        'confidence': confidence
+    }
+
+
+class RepetitionPolicy:
+    """
+    How many times a test is executed (see BenchmarkingController.run_execution_repeated()).
+
+    The warmup_runs are executed first and their results discarded. Then the measured runs are executed until:
+     - max_runs runs have been executed, or
+     - max_time seconds have passed since the first measured run, or
+     - (if ci_width is set) at least min_runs have been executed and the confidence interval of the mean of the
+       metric is narrower than ci_width (relative to the mean if relative is True, otherwise in the unit of the
+       metric)
+    """
+
+    def __init__(self, warmup_runs=0, min_runs=2, max_runs=10, max_time=None, metric='duration', ci_width=None,
+                 confidence=0.95, relative=True):
+        self.warmup_runs = warmup_runs
+        self.min_runs = max(min_runs, 2) if ci_width is not None else min_runs
+        self.max_runs = max(max_runs, 1)
+        self.max_time = max_time
+        self.metric = metric
+        self.ci_width = ci_width
+        self.confidence = confidence
+        self.relative = relative
+
+        # fail early if the confidence level is not supported
+        t_critical_value(confidence, 1)
+
+    def stop_reason(self, samples, elapsed):
+        """
+        :param samples: the values of the metric in the measured runs executed so far
+        :param elapsed: the seconds since the first measured run
+        :return: why no other runs are needed (one of the STOP_* constants) or None
+        """
+        if len(samples) >= self.max_runs:
+            return STOP_MAX_RUNS
+        if self.max_time is not None and elapsed >= self.max_time:
+            return STOP_MAX_TIME
+        if self.ci_width is None or len(samples) < self.min_runs:
+            return None
+
+        s = summarize(samples, self.confidence)
+        width = s['ci_high'] - s['ci_low']
+        if self.relative and s['mean']:
+            width /= abs(s['mean'])
+        if width <= self.ci_width:
+            return STOP_CI_WIDTH
+        return None
+
+    def get_sample(self, result):
+        value = (result.metrics or {}).get(self.metric, {}).get('value')
+        if not isinstance(value, numbers.Real):
+            raise ValueError('Metric "{0}" not found in the results of {1}/{2}'.format(
+                self.metric, result.tool, result.workload))
+        return value
+
+    def __str__(self) -> str:
+        return 'RepetitionPolicy(warmup={0}, runs={1}-{2}, max_time={3}, metric={4}, ci_width={5})'.format(
+            self.warmup_runs, self.min_runs, self.max_runs, self.max_time, self.metric, self.ci_width)
+
+
+def aggregate_results(results, policy, stop_reason):
+    """
+    Merges the results of the measured runs of a test in one result: the last one, with the mean of each numeric
+    metric as value, the values of each run in "samples" and the statistics of each metric in "summary". A metric
+    can be missing from some runs: the number of runs that produced it is the "runs" of its summary
+    """
+    r = results[-1]
+    samples = {}
+    # the last definition of each metric (e.g. with the unit), also for the metrics missing from the last run
+    definitions = {}
+    for run in results:
+        for name, m in (run.metrics or {}).items():
+            if isinstance(m, dict) and isinstance(m.get('value'), numbers.Real):
+                samples.setdefault(name, []).append(m['value'])
+                definitions[name] = m
+
+    r.samples = samples
+    r.summary = {name: summarize(values, policy.confidence) for name, values in samples.items()}
+    if r.metrics is None:
+        r.metrics = {}
+    for name, s in r.summary.items():
+        r.metrics[name] = dict(definitions[name], value=s['mean'])
+    r.repetition = {
+        'warmup_runs': policy.warmup_runs,
+        'runs': len(results),
+        'metric': policy.metric,
+        'stop_reason': stop_reason,
+        'first_start': results[0].start
+    }
+    return r
@@ -0,0 +1,348 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import logging
+import os
+import pickle
+import queue
+import struct
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BATCH_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_BATCH_MAX_DELAY = 60
+
+RESULTS_SPOOL_FILE = 'results-spool.dat'
+
+_STOP = object()
+
+
+def _result_size(result):
+    # the logs are by far the largest part of a result
+    logs = getattr(result, 'logs', None)
+    return len(logs) if isinstance(logs, (str, bytes)) else 0
+
+
+class ResultsBuffer:
+    """
+    Collects the execution results and saves them in batches with StorageConnector.save_execution_results().
+
+    The buffer is flushed when it contains max_count results, when the size of their logs exceeds max_bytes, when the
+    first buffered result has been waiting for max_delay seconds and when flush() is called (the controller does it
+    on exit). If the save fails, the results are kept in the buffer and saved with the next flush: only flush()
+    raises the error, add() and the timer log it.
+
+    If on_saved is set, it is called with the record ids (see add()) of the results saved by each flush
+    """
+
+    def __init__(self, connector, max_count, max_bytes=DEFAULT_BATCH_MAX_BYTES, max_delay=DEFAULT_BATCH_MAX_DELAY,
+                 on_saved=None):
+        self.connector = connector
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.on_saved = on_saved
+        self.__results = []
+        self.__bytes = 0
+        self.__timer = None
+        self.__lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.__results)
+
+    def add(self, result, record_id=None):
+        with self.__lock:
+            self.__results.append((result, record_id))
+            self.__bytes += _result_size(result)
+
+            if len(self.__results) >= self.max_count or self.__bytes >= self.max_bytes:
+                try:
+                    self.flush()
+                except Exception as ex:
+                    # not a failure of the result just added: it is kept with the others for the next flush
+                    logger.error('Error saving the buffered execution results: {0}. {1} results kept in the '
+                                 'buffer'.format(str(ex), len(self.__results)))
+            elif not self.__timer and self.max_delay:
+                self.__timer = threading.Timer(self.max_delay, self.__flush_on_timer)
+                self.__timer.daemon = True
+                self.__timer.start()
+
+    def flush(self):
+        with self.__lock:
+            if self.__timer:
+                self.__timer.cancel()
+                self.__timer = None
+
+            if not self.__results:
+                return
+
+            results, self.__results, self.__bytes = self.__results, [], 0
+            start = time.perf_counter()
+            try:
+                self.connector.save_execution_results([r for r, _ in results])
+            except Exception:
+                # keep them for the next flush
+                self.__results = results + self.__results
+                self.__bytes = sum(_result_size(r) for r, _ in self.__results)
+                raise
+
+            logger.debug('%d execution results saved in %.3f s', len(results), time.perf_counter() - start)
+
+            if self.on_saved:
+                self.on_saved([i for _, i in results if i is not None])
+
+    def __flush_on_timer(self):
+        try:
+            self.flush()
+        except Exception as ex:
+            logger.error('Error saving the buffered execution results: {0}'.format(str(ex)))
+
+
+class ResultsWriter:
+    """
+    Saves the execution results and errors in background threads, so that the storage does not delay the next
+    execution.
+
+    The records are put in a bounded queue drained by the writer threads: when the queue is full, submit() blocks
+    until a record has been saved (backpressure). flush() waits until all the submitted records are saved, close()
+    also stops the threads.
+
+    The records whose save fails are kept in failed: close() tries to save them again and raises the error if some
+    of them still cannot be saved
+    """
+
+    def __init__(self, save, queue_size=100, workers=1):
+        """
+        :param save: the function that saves a record, called by the writer threads with the arguments passed to
+        submit()
+        """
+        self.__save = save
+        self.__queue = queue.Queue(maxsize=queue_size)
+        self.__failed = []
+        self.__lock = threading.Lock()
+        self.__threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self.__run, name='benchsuite-results-writer-{0}'.format(i), daemon=True)
+            t.start()
+            self.__threads.append(t)
+
+    def submit(self, *args):
+        if not self.__threads:
+            raise RuntimeError('The results writer has been closed')
+        self.__queue.put(args)
+
+    def flush(self):
+        self.__queue.join()
+
+    @property
+    def failed(self):
+        """
+        :return: the arguments of submit() of the records not saved
+        """
+        with self.__lock:
+            return list(self.__failed)
+
+    def close(self):
+        threads, self.__threads = self.__threads, []
+        for _ in threads:
+            self.__queue.put(_STOP)
+        for t in threads:
+            t.join()
+
+        with self.__lock:
+            failed, self.__failed = self.__failed, []
+        error = None
+        for item in failed:
+            try:
+                self.__save(*item)
+            except Exception as ex:
+                self.__failed.append(item)
+                error = ex
+        if error:
+            logger.error('{0} execution records not saved'.format(len(self.__failed)))
+            raise error
+
+    def __run(self):
+        while True:
+            item = self.__queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self.__save(*item)
+            except Exception as ex:
+                logger.error('Error saving the execution {0}: {1}. It will be retried on close'.format(
+                    item[0], str(ex)))
+                with self.__lock:
+                    self.__failed.append(item)
+            finally:
+                self.__queue.task_done()
+
+
+class ResultsSpool:
+    """
+    Local append-only log of the execution results and errors to save.
+
+    Each record is appended (and flushed) before it is delivered to the storage and marked as delivered after, so
+    that the records are not lost if the storage is not configured, not reachable or fails. The records still pending
+    can be delivered later (see BenchmarkingController.replay_spooled_results()).
+
+    Each entry of the file is: the entry type (1 byte), the length of the payload (4 bytes) and the payload. The
+    payload of results (b'R') and errors (b'E') is the pickle of (record_id, record), the payload of the delivery
+    marks (b'D') is the record_id.
+
+    The spool can be shared by more processes (e.g. a controller and a replay): the accesses are serialized with an
+    flock() on the spool_file.lock file. Where flock() is not available, compact() does not rewrite the spool if
+    it has grown while it was read
+    """
+
+    __HEADER = struct.Struct('>cI')
+    __KINDS = {'result': b'R', 'error': b'E'}
+
+    def __init__(self, spool_file, fsync=False):
+        self.spool_file = spool_file
+        self.fsync = fsync
+        self.__lock = threading.Lock()
+        self.__lock_fd = None
+
+    def append(self, kind, record):
+        """
+        :return: the id of the record, to be passed to mark_delivered(), or None if the record cannot be spooled
+        """
+        record_id = uuid.uuid4().hex
+        try:
+            payload = pickle.dumps((record_id, record), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as ex:
+            logger.warning('Impossible to spool the execution {0}: {1}'.format(kind, str(ex)))
+            return None
+
+        self.__write([(self.__KINDS[kind], payload)])
+        return record_id
+
+    def mark_delivered(self, record_ids):
+        if record_ids:
+            self.__write([(b'D', i.encode('ascii')) for i in record_ids])
+
+    def pending(self):
+        """
+        :return: the records not delivered yet, as a list of (record_id, kind, record)
+        """
+        with self.__locked(shared=True):
+            return self.__pending()
+
+    def compact(self):
+        """
+        Rewrites the spool keeping only the records not delivered yet (or removes it if there are none)
+        """
+        with self.__locked():
+            size = self.__size()
+            pending = self.__pending()
+            if not fcntl and self.__size() != size:
+                logger.debug('%s modified while compacting it: not compacted', self.spool_file)
+                return
+
+            if not pending:
+                if size is not None:
+                    os.remove(self.spool_file)
+                return
+
+            tmp_file = self.spool_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                for record_id, kind, record in pending:
+                    payload = pickle.dumps((record_id, record), protocol=pickle.HIGHEST_PROTOCOL)
+                    f.write(self.__HEADER.pack(self.__KINDS[kind], len(payload)) + payload)
+            if not fcntl and self.__size() != size:
+                os.remove(tmp_file)
+                logger.debug('%s modified while compacting it: not compacted', self.spool_file)
+                return
+            os.replace(tmp_file, self.spool_file)
+
+        logger.info('%d execution results/errors are in the spool waiting to be saved (%s)',
+                    len(pending), self.spool_file)
+
+    def __pending(self):
+        records = {}
+        kinds = {v: k for k, v in self.__KINDS.items()}
+        for entry_type, payload in self.__read():
+            if entry_type == b'D':
+                records.pop(payload.decode('ascii'), None)
+            else:
+                record_id, record = pickle.loads(payload)
+                records[record_id] = (record_id, kinds[entry_type], record)
+        return list(records.values())
+
+    def __write(self, entries):
+        data = b''.join(self.__HEADER.pack(t, len(p)) + p for t, p in entries)
+        with self.__locked():
+            with open(self.spool_file, 'ab') as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+    @contextmanager
+    def __locked(self, shared=False):
+        # the lock is on a separate file because the spool file is replaced by compact(): a process waiting for a lock
+        # on it would then write in the old file
+        with self.__lock:
+            if not fcntl:
+                yield
+                return
+
+            if self.__lock_fd is None:
+                self.__lock_fd = os.open(self.spool_file + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.__lock_fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.__lock_fd, fcntl.LOCK_UN)
+
+    def __size(self):
+        try:
+            return os.path.getsize(self.spool_file)
+        except FileNotFoundError:
+            return None
+
+    def __read(self):
+        try:
+            f = open(self.spool_file, 'rb')
+        except FileNotFoundError:
+            return
+
+        with f:
+            while True:
+                header = f.read(self.__HEADER.size)
+                if len(header) < self.__HEADER.size:
+                    return
+                entry_type, length = self.__HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    # truncated by a crash while writing
+                    logger.warning('Ignoring truncated entry at the end of %s', self.spool_file)
+                    return
+                yield entry_type, payload
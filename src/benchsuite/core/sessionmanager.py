@@ -18,48 +18,289 @@
 # CloudPerfect EU project (https://cloudperfect.eu/)
 
 
+import hashlib
+import io
 import logging
 import os
 import pickle
+import sqlite3
+import threading
+from collections.abc import MutableMapping
 
-from benchsuite.core.model.exception import UndefinedSessionException
-
+from benchsuite.core.model.exception import UndefinedSessionException, UndefinedExecutionException
+from benchsuite.core.model.session import BenchmarkingSession
 
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_STORAGE_SESSIONS_FILE = 'sessions.dat'
+DEFAULT_STORAGE_SESSIONS_DB = 'sessions.db'
+
+_NOT_LOADED = object()
+
+
+class LazyExecutions(MutableMapping):
+    """
+    The executions of a session loaded from the storage. The executions are unpickled only when accessed the first
+    time
+    """
+
+    def __init__(self, exec_ids, loader):
+        self.__executions = dict.fromkeys(exec_ids, _NOT_LOADED)
+        self.__loader = loader
+        self.__lock = threading.Lock()
+
+    def __getitem__(self, exec_id):
+        e = self.__executions[exec_id]
+        if e is _NOT_LOADED:
+            with self.__lock:
+                e = self.__executions[exec_id]
+                if e is _NOT_LOADED:
+                    e = self.__executions[exec_id] = self.__loader(exec_id)
+        return e
+
+    def __setitem__(self, exec_id, execution):
+        self.__executions[exec_id] = execution
+
+    def __delitem__(self, exec_id):
+        del self.__executions[exec_id]
+
+    def __iter__(self):
+        return iter(list(self.__executions))
+
+    def __len__(self):
+        return len(self.__executions)
+
+    def loaded(self):
+        """returns the executions already unpickled"""
+        return {k: v for k, v in list(self.__executions.items()) if v is not _NOT_LOADED}
+
+
+class _ExecutionPickler(pickle.Pickler):
+    """Pickles an execution replacing the sessions with their ids"""
+
+    def persistent_id(self, obj):
+        if isinstance(obj, BenchmarkingSession):
+            return 'session', obj.id
+        return None
+
+
+class _ExecutionUnpickler(pickle.Unpickler):
+
+    def __init__(self, file, sessions):
+        super().__init__(file)
+        self.sessions = sessions
+
+    def persistent_load(self, pid):
+        kind, session_id = pid
+        return self.sessions[session_id]
+
 
 class SessionStorageManager:
+    """
+    Stores the sessions in a SQLite database. Each session (without its executions) and each execution are stored in
+    a different row, so that:
+     - only the sessions and the executions that changed are written by store()
+     - load() reads only the sessions, while the executions are loaded when accessed the first time
+
+    If the database does not exist, the sessions are imported from the legacy sessions.dat pickle file.
+
+    An index exec_id -> session of all the executions is maintained, so that executions can be looked up without
+    scanning (and loading) the executions of every session.
+
+    store() writes only the sessions handed out (by get(), add(), list(), get_execution(), ...) since the last store,
+    because only those can have been modified, and, of them, only the rows whose content changed
+    """
 
     def __init__(self, folder):
-        self.storage_file = folder + os.path.sep + DEFAULT_STORAGE_SESSIONS_FILE
+        self.storage_file = os.path.join(folder, DEFAULT_STORAGE_SESSIONS_DB)
+        self.legacy_storage_file = os.path.join(folder, DEFAULT_STORAGE_SESSIONS_FILE)
         self.sessions = {}
+        self.executions_index = {}
+        self.__digests = {}
+        # the ids of the sessions handed out and of the sessions removed since the last store()
+        self.__dirty = set()
+        self.__removed = set()
+        # session id -> ids of its executions in the database
+        self.__stored_executions = {}
+        self.__dirty_lock = threading.Lock()
+        self.__lock = threading.RLock()
+        self.__db = None
+
+    def __connect(self):
+        if not self.__db:
+            self.__db = sqlite3.connect(self.storage_file, check_same_thread=False)
+            self.__db.execute('CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, created REAL, data BLOB)')
+            self.__db.execute('CREATE TABLE IF NOT EXISTS executions ('
+                              'id TEXT PRIMARY KEY, session_id TEXT, data BLOB)')
+            self.__db.execute('CREATE INDEX IF NOT EXISTS executions_session_id ON executions(session_id)')
+            self.__db.commit()
+        return self.__db
 
     def load(self):
+        with self.__lock:
+            db = self.__connect()
+
+            self.sessions = {}
+            self.executions_index = {}
+            self.__digests = {}
+            self.__dirty = set()
+            self.__removed = set()
+            self.__stored_executions = {}
+
+            for session_id, data in db.execute('SELECT id, data FROM sessions ORDER BY created'):
+                clazz, state = pickle.loads(data)
+                s = clazz.__new__(clazz)
+                s.__dict__.update(state)
+                self.sessions[session_id] = s
+                self.__digests['s', session_id] = hashlib.sha1(data).digest()
+
+            exec_ids = {}
+            for exec_id, session_id in db.execute('SELECT id, session_id FROM executions ORDER BY rowid'):
+                exec_ids.setdefault(session_id, []).append(exec_id)
+
+            for s in self.sessions.values():
+                s.executions = LazyExecutions(exec_ids.get(s.id, []), self.__load_execution)
+                self.__stored_executions[s.id] = set(s.executions)
+                self.__index(s)
+
+            if self.sessions:
+                logger.debug('Benchmarking Sessions loaded from %s (%d sessions)', self.storage_file, len(self.sessions))
+                return
+
+        self.__load_legacy()
+
+    def __load_legacy(self):
         try:
-            self.sessions = pickle.load( open( self.storage_file, "rb"))
-            logger.debug('Benchmarking Sessions loaded from %s (%d sessions)', self.storage_file, len(self.sessions))
+            with open(self.legacy_storage_file, 'rb') as f:
+                self.sessions = pickle.load(f)
+            for s in self.sessions.values():
+                self.__index(s)
+            # none of them is in the database yet
+            self.__dirty = set(self.sessions)
+            logger.info('Benchmarking Sessions imported from legacy storage file %s (%d sessions)',
+                        self.legacy_storage_file, len(self.sessions))
 
         except FileNotFoundError:
-            logger.debug('Benchmarking Sessions storage file does not exit (%s) (Not loading sessions)', self.storage_file)
+            logger.debug('Benchmarking Sessions storage does not exit (%s) (Not loading sessions)', self.storage_file)
 
+    def __load_execution(self, exec_id):
+        with self.__lock:
+            data, = self.__connect().execute('SELECT data FROM executions WHERE id = ?', (exec_id,)).fetchone()
+            self.__digests['e', exec_id] = hashlib.sha1(data).digest()
+            return _ExecutionUnpickler(io.BytesIO(data), self.sessions).load()
 
     def store(self):
-        pickle.dump(self.sessions, open(self.storage_file, "wb"))
-        logger.debug('Benchmarking Sessions stored to %s (%d sessions)', self.storage_file, len(self.sessions))
+        with self.__lock:
+            db = self.__connect()
+            with self.__dirty_lock:
+                dirty, self.__dirty = self.__dirty, set()
+                removed, self.__removed = self.__removed, set()
+            written = []
+
+            try:
+                with db:
+                    for session_id in removed:
+                        if self.__stored_executions.pop(session_id, None) is not None:
+                            db.execute('DELETE FROM executions WHERE session_id = ?', (session_id,))
+                            db.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+                        self.__digests.pop(('s', session_id), None)
+
+                    for session_id in dirty:
+                        s = self.sessions.get(session_id)
+                        if s is None:
+                            continue
+                        self.__store_session(db, s, written)
+
+            except Exception:
+                # written again by the next store()
+                for key in written:
+                    self.__digests.pop(key, None)
+                with self.__dirty_lock:
+                    self.__dirty |= dirty
+                    self.__removed |= removed
+                raise
+
+            if os.path.isfile(self.legacy_storage_file):
+                os.replace(self.legacy_storage_file, self.legacy_storage_file + '.migrated')
+
+        logger.debug('Benchmarking Sessions stored to %s (%d sessions, %d rows written)',
+                     self.storage_file, len(self.sessions), len(written))
+
+    def __store_session(self, db, s, written):
+        state = s.__getstate__()
+        state['executions'] = None
+        self.__write(db, ('s', s.id), pickle.dumps((type(s), state)),
+                     'INSERT OR REPLACE INTO sessions (id, created, data) VALUES (?, ?, ?)', (s.id, s.created),
+                     written)
+
+        executions = s.executions.loaded() if isinstance(s.executions, LazyExecutions) else s.executions
+        for e in executions.values():
+            buf = io.BytesIO()
+            _ExecutionPickler(buf).dump(e)
+            self.__write(db, ('e', e.id), buf.getvalue(),
+                         'INSERT OR REPLACE INTO executions (id, session_id, data) VALUES (?, ?, ?)', (e.id, s.id),
+                         written)
+
+        exec_ids = set(s.executions)
+        for exec_id in self.__stored_executions.get(s.id, set()) - exec_ids:
+            db.execute('DELETE FROM executions WHERE id = ?', (exec_id,))
+            self.__digests.pop(('e', exec_id), None)
+        self.__stored_executions[s.id] = exec_ids
+
+    def __write(self, db, key, data, query, params, written):
+        digest = hashlib.sha1(data).digest()
+        if self.__digests.get(key) == digest:
+            return
+        db.execute(query, params + (data,))
+        self.__digests[key] = digest
+        written.append(key)
 
     def list(self):
+        self.__mark_dirty(self.sessions)
         return self.sessions.values()
 
     def get(self, session_id):
         if session_id not in self.sessions:
             raise UndefinedSessionException('The session with id={0} does not exist'.format(session_id))
 
+        self.__mark_dirty([session_id])
         return self.sessions[session_id]
 
     def add(self, session):
         self.sessions[session.id] = session
+        self.__index(session)
+        with self.__dirty_lock:
+            self.__removed.discard(session.id)
+            self.__dirty.add(session.id)
 
     def remove(self, session):
-        del self.sessions[session.id]
\ No newline at end of file
+        del self.sessions[session.id]
+        with self.__dirty_lock:
+            self.__dirty.discard(session.id)
+            self.__removed.add(session.id)
+        session.execution_index = None
+        for exec_id in list(session.executions):
+            self.executions_index.pop(exec_id, None)
+
+    def __mark_dirty(self, session_ids):
+        # the sessions handed out can be modified: they are checked by the next store()
+        with self.__dirty_lock:
+            self.__dirty.update(session_ids)
+
+    def __index(self, session):
+        session.execution_index = self.executions_index
+        for exec_id in session.executions:
+            self.executions_index[exec_id] = session
+
+    def get_execution(self, exec_id):
+        if exec_id not in self.executions_index:
+            raise UndefinedExecutionException('Execution with id={0} does not exist'.format(exec_id))
+
+        session = self.executions_index[exec_id]
+        self.__mark_dirty([session.id])
+        return session.get_execution(exec_id)
+
+    def list_executions(self):
+        self.__mark_dirty(self.sessions)
+        return [s.get_execution(exec_id) for exec_id, s in list(self.executions_index.items())]
@@ -0,0 +1,290 @@
+# Benchmarking Suite
+# Copyright 2014-2017 Engineering Ingegneria Informatica S.p.A.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#
+# Developed in the ARTIST EU project (www.artist-project.eu) and in the
+# CloudPerfect EU project (https://cloudperfect.eu/)
+
+import contextvars
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+#
+# Tracing of the operations of the controller and of the executions.
+#
+# The spans are timed with time.perf_counter_ns() (monotonic, high resolution). The start and end timestamps are
+# computed from the wall clock time read once when the Tracer is created, so that they are comparable across spans
+# and exportable, but not affected by changes of the system clock.
+#
+# The current span is kept in a context variable: span() opens a child of the current span (if any) and does nothing
+# if there is no current span, so that the code of the executions can be instrumented without depending on the
+# controller. The functions executed in other threads must be wrapped with propagate() to keep the parent span.
+#
+
+_current_span = contextvars.ContextVar('benchsuite_current_span', default=None)
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# OTLP SpanKind INTERNAL
+_SPAN_KIND_INTERNAL = 1
+
+
+class Span:
+
+    def __init__(self, tracer, name, trace_id, parent_id, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = '{0:016x}'.format(random.getrandbits(64))
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.status_message = None
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, exception):
+        self.status = STATUS_ERROR
+        self.status_message = '{0}: {1}'.format(type(exception).__name__, str(exception))
+
+    @property
+    def duration(self):
+        """the duration in seconds"""
+        return (self.end_ns - self.start_ns) / 1e9 if self.end_ns is not None else None
+
+    @property
+    def start_time_unix_nano(self):
+        return self.tracer.to_unix_nano(self.start_ns)
+
+    @property
+    def end_time_unix_nano(self):
+        return self.tracer.to_unix_nano(self.end_ns)
+
+    def __str__(self) -> str:
+        return '{0} ({1:.6f} s)'.format(self.name, self.duration or 0)
+
+
+class _NoopSpan:
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, exception):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Creates the spans and passes them to the exporters (e.g. InMemoryCollector, OTLPJsonFileExporter) when they end
+    """
+
+    def __init__(self, *exporters, service_name='benchsuite'):
+        self.exporters = list(exporters)
+        self.service_name = service_name
+        self.__base_unix_ns = time.time_ns()
+        self.__base_ns = time.perf_counter_ns()
+
+    def to_unix_nano(self, perf_counter_ns):
+        return self.__base_unix_ns + perf_counter_ns - self.__base_ns
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Opens a span, child of the current one if it belongs to this tracer
+        """
+        parent = _current_span.get()
+        if parent is not None and parent.tracer is self:
+            s = Span(self, name, parent.trace_id, parent.span_id, attributes)
+        else:
+            s = Span(self, name, '{0:032x}'.format(random.getrandbits(128)), None, attributes)
+
+        token = _current_span.set(s)
+        try:
+            yield s
+        except BaseException as ex:
+            s.set_error(ex)
+            raise
+        finally:
+            s.end_ns = time.perf_counter_ns()
+            _current_span.reset(token)
+            if s.status == STATUS_UNSET:
+                s.status = STATUS_OK
+            for e in self.exporters:
+                try:
+                    e.export(s)
+                except Exception as ex:
+                    logger.warning('Error exporting span %s: %s', name, str(ex))
+
+    def flush(self):
+        for e in self.exporters:
+            e.flush()
+
+
+class NoopTracer:
+    """
+    The tracer used when tracing is not enabled
+    """
+
+    @contextmanager
+    def span(self, name, **attributes):
+        yield _NOOP_SPAN
+
+    def flush(self):
+        pass
+
+
+NOOP_TRACER = NoopTracer()
+
+
+def span(name, **attributes):
+    """
+    Opens a child of the current span, or does nothing if there is no current span
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_TRACER.span(name)
+    return parent.tracer.span(name, **attributes)
+
+
+def current_span():
+    return _current_span.get() or _NOOP_SPAN
+
+
+def execution_attributes(execution):
+    """
+    :return: the attributes that identify a BenchmarkExecution in the spans
+    """
+    return {'exec_id': execution.id, 'tool': execution.test.tool_id, 'workload': execution.test.workload_id,
+            'provider': execution.session.provider.name, 'service_type': execution.session.provider.service_type}
+
+
+def propagate(func):
+    """
+    :return: a function that executes func in a copy of the current context (e.g. in another thread), so that its
+    spans are children of the current span
+    """
+    context = contextvars.copy_context()
+    return functools.partial(context.run, func)
+
+
+class InMemoryCollector:
+    """
+    Keeps the ended spans in memory
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.__lock = threading.Lock()
+
+    def export(self, span):
+        with self.__lock:
+            self.spans.append(span)
+
+    def flush(self):
+        pass
+
+    def clear(self):
+        with self.__lock:
+            self.spans = []
+
+    def find(self, name):
+        return [s for s in self.spans if s.name == name]
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_span(span):
+    data = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': _SPAN_KIND_INTERNAL,
+        'startTimeUnixNano': str(span.start_time_unix_nano),
+        'endTimeUnixNano': str(span.end_time_unix_nano),
+        'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in span.attributes.items() if v is not None],
+        'status': {'code': span.status}
+    }
+    if span.parent_id:
+        data['parentSpanId'] = span.parent_id
+    if span.status_message:
+        data['status']['message'] = span.status_message
+    return data
+
+
+class OTLPJsonFileExporter:
+    """
+    Appends the spans to a file in the OTLP JSON format: one ExportTraceServiceRequest (resourceSpans) per line, each
+    with up to batch_size spans (the same format of the file exporter of the OpenTelemetry Collector)
+    """
+
+    def __init__(self, file, batch_size=512, service_name='benchsuite'):
+        self.file = file
+        self.batch_size = batch_size
+        self.service_name = service_name
+        self.__spans = []
+        self.__lock = threading.Lock()
+
+    def export(self, span):
+        with self.__lock:
+            self.__spans.append(span)
+            if len(self.__spans) >= self.batch_size:
+                self.__write()
+
+    def flush(self):
+        with self.__lock:
+            self.__write()
+
+    def __write(self):
+        if not self.__spans:
+            return
+
+        spans, self.__spans = self.__spans, []
+        request = {
+            'resourceSpans': [{
+                'resource': {
+                    'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]
+                },
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [_otlp_span(s) for s in spans]
+                }]
+            }]
+        }
+        with open(self.file, 'a') as f:
+            f.write(json.dumps(request) + '\n')
+        logger.debug('%d spans written to %s', len(spans), self.file)